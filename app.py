@@ -1,6 +1,13 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import logging
+import os
 import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple
 
 logging.basicConfig(
     level=logging.INFO,
@@ -12,8 +19,27 @@ logging.basicConfig(
 
 from config import get_config
 from email_client import EmailClient
-from bucket_manager import BucketManager
-from categorizer import EmailCategorizer
+from backends import Backends, STARTING, READY, FAILED
+from recategorizer import RecategorizationJob
+from profiling import begin_run, end_run
+from scheduler import CategorizationScheduler, PRIORITY_VISIBLE
+from categorizer import DEFERRED_TIER
+from models import BucketBundle, BucketChange, BucketCategory
+
+EMAILS_PER_PAGE = 10
+#bodies longer than this get the full-summary button
+LONG_EMAIL_CHARS = 500
+#0 turns off polling for background work
+AUTO_REFRESH_SECONDS = float(os.getenv('AUTOKITE_REFRESH_SECONDS', '1.0'))
+#sidebar service stats are reused across polling reruns for this long
+HEALTH_REFRESH_SECONDS = 5.0
+#a session's scheduler is closed after this long without a rerun from it
+SCHEDULER_IDLE_SECONDS = float(os.getenv('AUTOKITE_SCHEDULER_IDLE_SECONDS', '900'))
+
+_autorefresh = components.declare_component(
+    "autorefresh",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "autorefresh")
+)
 
 
 st.set_page_config(
@@ -26,24 +52,55 @@ st.set_page_config(
 
 @st.cache_resource
 def initialize_managers():
-    config = get_config()
-    return {
-        'config': config,
-        'bucket_manager': BucketManager(config.chroma),
-        'categorizer': EmailCategorizer(config.ollama)
-    }
+    #returns immediately, backends come up in background threads
+    return Backends(get_config())
+
+
+class SessionSchedulers:
+    #streamlit has no public session-end hook; sessions check in on every run
+    #and schedulers of sessions idle past the ttl are closed on access
+
+    def __init__(self, idle_seconds: float):
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._schedulers: Dict[str, Tuple[CategorizationScheduler, float]] = {}
+
+    def touch(self, session_key: str, scheduler: Optional[CategorizationScheduler]):
+        now = time.monotonic()
+        with self._lock:
+            for key, (other, seen) in list(self._schedulers.items()):
+                if key != session_key and now - seen > self.idle_seconds:
+                    del self._schedulers[key]
+                    other.close()
+                    logging.info(f"Closed categorization scheduler idle for {now - seen:.0f}s")
+            if scheduler is None:
+                return
+            previous = self._schedulers.get(session_key)
+            if previous is not None and previous[0] is not scheduler:
+                previous[0].close()
+            self._schedulers[session_key] = (scheduler, now)
+
+
+@st.cache_resource
+def session_schedulers() -> SessionSchedulers:
+    return SessionSchedulers(SCHEDULER_IDLE_SECONDS)
 
 
 class EmailApp:
 
     def __init__(self):
-        self.managers = initialize_managers()
-        self.config = self.managers['config']
-        self.bucket_manager = self.managers['bucket_manager']
-        self.categorizer = self.managers['categorizer']
+        self.backends = initialize_managers()
+        self.config = self.backends.config
+        self.bucket_manager = self.backends.bucket_manager
+        self.categorizer = self.backends.categorizer
+        self.ready = self.bucket_manager is not None and self.categorizer is not None
         
         if 'buckets' not in st.session_state:
+            st.session_state.buckets = []
+        
+        if self.bucket_manager and not st.session_state.get('buckets_loaded'):
             st.session_state.buckets = self.bucket_manager.get_all_buckets()
+            st.session_state.buckets_loaded = True
         
         if 'categorized_emails' not in st.session_state:
             st.session_state.categorized_emails = []
@@ -53,6 +110,37 @@ class EmailApp:
         
         if 'selected_email' not in st.session_state:
             st.session_state.selected_email = None
+        
+        if 'recategorization_jobs' not in st.session_state:
+            st.session_state.recategorization_jobs = []
+        
+        scheduler = st.session_state.get('scheduler')
+        if (scheduler is None or scheduler.closed) and self.ready:
+            if scheduler is not None:
+                #closed while the session was away, its queue is gone
+                st.session_state.scheduled = False
+            st.session_state.scheduler = CategorizationScheduler(
+                self.categorizer,
+                self.bucket_manager,
+                shortlist_size=self.config.chroma.shortlist_size,
+                workers=self.config.ollama.workers,
+                deadline=self.config.ollama.fetch_deadline,
+                retry_delay=self.config.ollama.breaker_cooldown,
+                history=self.backends.history
+            )
+        self.scheduler = st.session_state.get('scheduler')
+        if 'session_key' not in st.session_state:
+            st.session_state.session_key = uuid.uuid4().hex
+        session_schedulers().touch(st.session_state.session_key, self.scheduler)
+        
+        if 'page' not in st.session_state:
+            st.session_state.page = 0
+        
+        if 'long_summaries' not in st.session_state:
+            st.session_state.long_summaries = {}
+        
+        if st.session_state.get('scheduled'):
+            st.session_state.categorized_emails = self.scheduler.results()
     
     def render_sidebar(self):
         with st.sidebar:
@@ -64,9 +152,67 @@ class EmailApp:
             st.text(f"Email: {self.config.email.email}")
             st.markdown("---")
             
+            #backend startup
+            st.subheader("⚙️ Backends")
+            for key, status in self.backends.get_status().items():
+                icon = {STARTING: "⏳", READY: "🟢", FAILED: "🔴"}[status.state]
+                took = f" ({status.seconds:.1f}s)" if status.state != STARTING else ""
+                st.caption(f"{icon} {status.name}: {status.detail}{took}")
+                if status.state == FAILED and st.button(f"🔁 Retry {status.name}", key=f"retry_{key}",
+                                                        use_container_width=True):
+                    self.backends.restart(key)
+                    st.rerun()
+
+            #ollama hosts
+            with st.expander("🖥️ Ollama Hosts", expanded=False):
+                health = self._service_health()
+                
+                for stats in health.get('hosts', []):
+                    status_icon = "🟢" if stats['healthy'] else "🔴"
+                    st.caption(
+                        f"{status_icon} {stats['host']} · in flight {stats['in_flight']} · "
+                        f"{stats['avg_latency'] * 1000:.0f} ms avg · {stats['throughput']:.2f} req/s"
+                    )
+
+                #tiered categorization
+                escalation = health.get('escalation')
+                if self.config.ollama.escalation_model and escalation:
+                    st.caption(
+                        f"⬆️ Escalated to {self.config.ollama.escalation_model}: "
+                        f"{escalation['escalated']}/{escalation['total']} "
+                        f"({escalation['escalation_rate']:.0%}) · "
+                        f"{escalation['low_confidence']} low confidence · "
+                        f"{escalation['parse_failures']} parse failures · "
+                        f"{escalation.get('kept_primary', 0)} kept primary"
+                    )
+                
+                #shared service
+                service = health.get('service')
+                if service:
+                    st.caption(
+                        f"🔗 Service: {service['executed']} run · {service['cache_hits']} cached · "
+                        f"{service['deduplicated']} deduplicated · {service['in_flight']} in flight"
+                    )
+                
+                #timeouts, hedging and the circuit breaker
+                calls = health.get('calls')
+                if calls:
+                    circuit = calls['circuit']
+                    circuit_icon = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}.get(circuit['state'], "⚪")
+                    hedge_after = f"{calls['hedge_after'] * 1000:.0f} ms" if calls['hedge_after'] else "warming up"
+                    st.caption(
+                        f"{circuit_icon} Circuit {circuit['state'].replace('_', '-')} · "
+                        f"{calls['timeouts']} timeouts · {calls['short_circuited']} failed fast · "
+                        f"hedge after {hedge_after} ({calls['hedge_wins']}/{calls['hedged']} won)"
+                    )
+            
             #bucket management 
             st.subheader("🗂️ Manage Buckets")
             
+            if self.bucket_manager is None:
+                st.info("⏳ Loading buckets...")
+                return
+            
             #buckets
             if st.button("🔄 Refresh Buckets", use_container_width=True):
                 self._load_buckets()
@@ -92,6 +238,12 @@ class EmailApp:
                         else:
                             st.error("Please fill in both title and prompt")
             
+            #bucket sets between deployments
+            with st.expander("📦 Import / Export Buckets", expanded=False):
+                self._render_bucket_transfer()
+            
+            self._render_recategorization_status()
+            
             st.markdown("---")
             
             if st.session_state.buckets:
@@ -100,14 +252,20 @@ class EmailApp:
                 for bucket in st.session_state.buckets:
                     with st.expander(f"🗂️ {bucket.title}"):
                         st.text(f"ID: {bucket.id[:8]}...")
-                        st.text_area(
+                        edited_prompt = st.text_area(
                             "Prompt",
                             value=bucket.prompt,
                             height=80,
-                            disabled=True,
                             key=f"prompt_{bucket.id}"
                         )
                         
+                        if edited_prompt != bucket.prompt and st.button(
+                            "💾 Save Prompt",
+                            key=f"save_{bucket.id}",
+                            use_container_width=True
+                        ):
+                            self._update_bucket(bucket.id, edited_prompt)
+                        
                         if st.button(
                             "🗑️ Delete",
                             key=f"del_{bucket.id}",
@@ -115,6 +273,71 @@ class EmailApp:
                         ):
                             self._delete_bucket(bucket.id)
     
+    def _service_health(self) -> dict:
+        if self.categorizer is None:
+            return {}
+        #polling reruns every second, the service doesn't need asking that often
+        cached = st.session_state.get('service_health')
+        if cached and time.monotonic() - cached[0] < HEALTH_REFRESH_SECONDS:
+            return cached[1]
+        try:
+            health = self.categorizer.health()
+        except Exception as e:
+            logging.warning(f"Categorization service health check failed: {str(e)}")
+            health = {}
+        st.session_state.service_health = (time.monotonic(), health)
+        return health
+    
+    def _render_recategorization_status(self):
+        jobs = st.session_state.recategorization_jobs
+        if not jobs:
+            return
+        
+        for job in jobs:
+            report = job.report
+            if report.error:
+                st.error(f"♻️ Re-categorization failed: {report.error}")
+            elif report.done:
+                st.caption(f"♻️ Re-checked {report.rechecked}/{report.total} emails, "
+                           f"{report.changed} moved")
+            else:
+                st.caption(f"♻️ Re-checking {report.rechecked}/{report.selected} "
+                           f"of {report.total} emails...")
+        
+        #fold finished jobs into the emails shown in this session
+        finished = [job for job in jobs if job.report.done]
+        for job in finished:
+            self._apply_recategorization(job.report.updated)
+        st.session_state.recategorization_jobs = [job for job in jobs if not job.report.done]
+    
+    def _apply_recategorization(self, updated: dict):
+        if not updated:
+            return
+        
+        for cat_email in st.session_state.categorized_emails:
+            result = updated.get(cat_email.email.uid)
+            if result:
+                cat_email.bucket_id = result.bucket_id
+                cat_email.bucket_title = result.bucket_title
+                cat_email.summary = result.summary
+                cat_email.confidence = result.confidence
+                cat_email.model_tier = result.model_tier
+                cat_email.model = result.model
+    
+    def _start_recategorization(self, change: BucketChange, bucket_id: str):
+        if self.categorizer is None:
+            return
+        job = RecategorizationJob(
+            self.bucket_manager,
+            self.categorizer,
+            change,
+            bucket_id,
+            shortlist_size=self.config.chroma.shortlist_size,
+            profiling=self.config.profiling,
+            history=self.backends.history
+        ).start()
+        st.session_state.recategorization_jobs.append(job)
+    
     def render_main_area(self):
         if st.session_state.selected_email is not None:
             self._render_full_email()
@@ -130,7 +353,8 @@ class EmailApp:
             fetch_button = st.button(
                 "📥 Fetch Unread Emails",
                 use_container_width=True,
-                type="primary"
+                type="primary",
+                disabled=not self.ready
             )
         
         with col2:
@@ -141,7 +365,15 @@ class EmailApp:
         
         with col3:
             if st.session_state.emails_loaded:
-                st.success(f"✅ {len(st.session_state.categorized_emails)} emails loaded")
+                pending = self.scheduler.pending_count if st.session_state.get('scheduled') else 0
+                deferred = self.scheduler.deferred_count if st.session_state.get('scheduled') else 0
+                if pending:
+                    st.info(f"⏳ {len(st.session_state.categorized_emails) - pending}/"
+                            f"{len(st.session_state.categorized_emails)} emails categorized")
+                elif deferred:
+                    st.warning(f"⏳ {deferred} emails left uncategorized while Ollama is unavailable, retrying")
+                else:
+                    st.success(f"✅ {len(st.session_state.categorized_emails)} emails loaded")
         
         #fetch emails
         if fetch_button:
@@ -149,17 +381,84 @@ class EmailApp:
         
         #clear display
         if clear_button:
+            if self.scheduler:
+                self.scheduler.cancel()
+            st.session_state.scheduled = False
             st.session_state.categorized_emails = []
             st.session_state.emails_loaded = False
             st.session_state.selected_email = None
+            st.session_state.page = 0
         
         st.markdown("---")
         
+        if self.bucket_manager and self._render_search():
+            return
+        
         if st.session_state.categorized_emails:
             self._render_categorized_emails()
         else:
             st.info("👆 Click 'Fetch Unread Emails' to load and categorize your emails")
     
+    def _render_search(self) -> bool:
+        query = st.text_input(
+            "🔍 Search processed emails",
+            placeholder="e.g., contract renewal with Acme",
+            key="search_query"
+        )
+        
+        with st.expander("Search filters", expanded=False):
+            col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
+            
+            bucket_options = {"All buckets": None, "Uncategorized": "uncategorized"}
+            bucket_options.update({b.title: b.id for b in st.session_state.buckets})
+            
+            with col1:
+                bucket_label = st.selectbox("Bucket", list(bucket_options), key="search_bucket")
+            with col2:
+                sender = st.text_input("Sender", placeholder="name@example.com", key="search_sender")
+            with col3:
+                date_range = st.date_input("Date range", value=(), key="search_dates")
+            with col4:
+                n_results = st.number_input("Results", min_value=1, max_value=100, value=10, key="search_n")
+        
+        if not query:
+            return False
+        
+        date_from = datetime.combine(date_range[0], datetime.min.time()) if len(date_range) > 0 else None
+        date_to = datetime.combine(date_range[1], datetime.max.time()) if len(date_range) > 1 else None
+        
+        results = self.bucket_manager.search_emails(
+            query,
+            n_results=int(n_results),
+            bucket_id=bucket_options[bucket_label],
+            sender=sender.strip() or None,
+            date_from=date_from,
+            date_to=date_to
+        )
+        
+        st.caption(f"{len(results)} matches in {self.bucket_manager.get_indexed_email_count()} indexed emails")
+        
+        for idx, result in enumerate(results):
+            cat_email = result.categorized
+            email = cat_email.email
+            
+            col1, col2 = st.columns([6, 2])
+            with col1:
+                st.markdown(f"📧 {email.subject}")
+                st.caption(f"From: {email.sender} · {email.date.strftime('%b %d, %Y')}")
+                st.caption(f"Summary: {cat_email.summary}")
+                
+                if st.button("Open Email", key=f"search_open_{idx}"):
+                    st.session_state.selected_email = cat_email
+                    st.rerun()
+            
+            with col2:
+                st.caption(f"📁 {cat_email.bucket_title}")
+            
+            st.markdown("---")
+        
+        return True
+    
     def _render_categorized_emails(self):
         sorted_emails = sorted(
             st.session_state.categorized_emails,
@@ -167,8 +466,34 @@ class EmailApp:
             reverse=True
         )
         
-        for idx, cat_email in enumerate(sorted_emails):
+        #pagination
+        page_count = max(1, -(-len(sorted_emails) // EMAILS_PER_PAGE))
+        page = min(st.session_state.page, page_count - 1)
+        page_emails = sorted_emails[page * EMAILS_PER_PAGE:(page + 1) * EMAILS_PER_PAGE]
+        
+        #whatever is on screen gets categorized before the rest
+        if self.scheduler:
+            self.scheduler.promote(
+                [c.email.uid for c in page_emails if c.bucket_id == BucketCategory.PENDING.value],
+                priority=PRIORITY_VISIBLE
+            )
+        
+        if page_count > 1:
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("⬅️ Newer", disabled=page == 0, use_container_width=True):
+                    st.session_state.page = page - 1
+                    st.rerun()
+            with col2:
+                st.caption(f"Page {page + 1} of {page_count}")
+            with col3:
+                if st.button("Older ➡️", disabled=page >= page_count - 1, use_container_width=True):
+                    st.session_state.page = page + 1
+                    st.rerun()
+        
+        for cat_email in page_emails:
             email = cat_email.email
+            pending = cat_email.bucket_id == BucketCategory.PENDING.value
             
             with st.container():
                 col1, col2, col3 = st.columns([6, 2, 1])
@@ -180,16 +505,23 @@ class EmailApp:
                     st.caption(f"From: {email.sender}")
                     st.caption(f"Summary: {cat_email.summary}")
 
-                    if st.button(f"Open Email", key=f"open_{idx}", help="Click to open"):
+                    if st.button(f"Open Email", key=f"open_{email.uid}", help="Click to open"):
                         st.session_state.selected_email = cat_email
                         st.rerun()
                 
                 with col2:
-                    st.caption(f"📁 {cat_email.bucket_title}")
+                    if pending:
+                        st.caption("⏳ Categorizing...")
+                    elif cat_email.model_tier == DEFERRED_TIER:
+                        st.caption(f"📁 {cat_email.bucket_title} · ⏳ retry pending")
+                    else:
+                        st.caption(f"📁 {cat_email.bucket_title}")
                 
                 with col3:
                     #confidence
-                    if cat_email.confidence > 0.7:
+                    if pending:
+                        confidence_icon = "⏳"
+                    elif cat_email.confidence > 0.7:
                         confidence_icon = "🟢"
                     elif cat_email.confidence > 0.4:
                         confidence_icon = "🟡"
@@ -203,6 +535,14 @@ class EmailApp:
         cat_email = st.session_state.selected_email
         email = cat_email.email
         
+        #opened before categorization finished: jump the queue
+        if cat_email.bucket_id == BucketCategory.PENDING.value and self.scheduler:
+            result = self.scheduler.result(email.uid)
+            if result:
+                cat_email = st.session_state.selected_email = result
+            else:
+                self.scheduler.promote([email.uid])
+        
         col1, col2 = st.columns([1, 5])
         with col1:
             if st.button("⬅️ Back to Inbox", use_container_width=True):
@@ -220,20 +560,28 @@ class EmailApp:
             st.markdown(f"**Date:** {email.date.strftime('%A, %B %d, %Y at %I:%M %p')}")
         
         with col2:
-            st.markdown(f"**📁 Category:** {cat_email.bucket_title}")
-            
-            #confidence 
-            if cat_email.confidence > 0.7:
-                confidence_color = "🟢"
-                confidence_label = "High"
-            elif cat_email.confidence > 0.4:
-                confidence_color = "🟡"
-                confidence_label = "Medium"
+            if cat_email.bucket_id == BucketCategory.PENDING.value:
+                st.markdown("**📁 Category:** ⏳ Categorizing...")
+            elif cat_email.model_tier == DEFERRED_TIER:
+                st.markdown(f"**📁 Category:** {cat_email.bucket_title} · ⏳ retry pending")
             else:
-                confidence_color = "🔴"
-                confidence_label = "Low"
-            
-            st.markdown(f"**Confidence:** {confidence_color} {confidence_label} ({cat_email.confidence:.0%})")
+                st.markdown(f"**📁 Category:** {cat_email.bucket_title}")
+                
+                #confidence 
+                if cat_email.confidence > 0.7:
+                    confidence_color = "🟢"
+                    confidence_label = "High"
+                elif cat_email.confidence > 0.4:
+                    confidence_color = "🟡"
+                    confidence_label = "Medium"
+                else:
+                    confidence_color = "🔴"
+                    confidence_label = "Low"
+                
+                st.markdown(f"**Confidence:** {confidence_color} {confidence_label} ({cat_email.confidence:.0%})")
+                
+                if cat_email.model:
+                    st.caption(f"🤖 {cat_email.model} ({cat_email.model_tier})")
         
         st.markdown("---")
 
@@ -241,6 +589,20 @@ class EmailApp:
 
         st.caption(f"{cat_email.summary}")
 
+        #the summary above only saw the snippet, long emails can get a full one
+        long_summary = st.session_state.long_summaries.get(email.uid)
+        if long_summary:
+            st.markdown("##### 📑 Full Summary")
+            st.write(long_summary)
+        elif len(email.body or "") > LONG_EMAIL_CHARS:
+            if st.button("📑 Summarize full email", disabled=self.categorizer is None):
+                with st.spinner("Summarizing full email..."):
+                    long_summary = self.categorizer.summarize_email(email)
+                if long_summary:
+                    st.session_state.long_summaries[email.uid] = long_summary
+                    st.rerun()
+                else:
+                    st.error("Failed to summarize email")
 
         st.markdown("---")
         
@@ -279,12 +641,48 @@ class EmailApp:
             with st.spinner("Creating bucket..."):
                 bucket = self.bucket_manager.create_bucket(title, prompt)
                 st.session_state.buckets.append(bucket)
+            self._start_recategorization(BucketChange.CREATED, bucket.id)
             st.success(f"✅ Created bucket: {title}")
         except Exception as e:
             st.error(f"Failed to create bucket: {str(e)}")
         finally:
             st.session_state["creating_bucket"] = False
     
+    def _render_bucket_transfer(self):
+        if st.button("Prepare Export", use_container_width=True):
+            try:
+                with st.spinner("Exporting buckets..."):
+                    st.session_state.bucket_export = self.bucket_manager.export_bundle().to_bytes()
+            except Exception as e:
+                st.error(f"Failed to export buckets: {str(e)}")
+        
+        if st.session_state.get("bucket_export"):
+            st.download_button(
+                "⬇️ Download Bundle",
+                data=st.session_state.bucket_export,
+                file_name=f"buckets-{datetime.now():%Y%m%d}.json.gz",
+                mime="application/gzip",
+                use_container_width=True
+            )
+        
+        uploaded = st.file_uploader("Bucket bundle", type=["gz", "json"], key="bucket_bundle_upload")
+        replace = st.checkbox("Replace existing buckets", value=False,
+                              help="Delete buckets that are not in the bundle")
+        if uploaded is not None and st.button("Import Bundle", use_container_width=True):
+            self._import_buckets(uploaded.getvalue(), replace)
+    
+    def _import_buckets(self, data: bytes, replace: bool):
+        try:
+            with st.spinner("Importing buckets..."):
+                bundle = BucketBundle.from_bytes(data)
+                stats = self.bucket_manager.import_bundle(bundle, replace=replace)
+                st.session_state.buckets = self.bucket_manager.get_all_buckets()
+            #imports skip recategorization, the next fetch uses the new set
+            st.success(f"✅ Imported {stats['imported']} buckets "
+                       f"({stats['embedded']} re-embedded, {stats['removed']} removed)")
+        except Exception as e:
+            st.error(f"Failed to import buckets: {str(e)}")
+    
     def _delete_bucket(self, bucket_id: str):
         try:
             with st.spinner("Deleting bucket..."):
@@ -292,12 +690,27 @@ class EmailApp:
                     st.session_state.buckets = [
                         b for b in st.session_state.buckets if b.id != bucket_id
                     ]
+                    self._start_recategorization(BucketChange.DELETED, bucket_id)
             st.success("✅ Bucket deleted")
             st.rerun()
         except Exception as e:
             st.error(f"Failed to delete bucket: {str(e)}")
     
+    def _update_bucket(self, bucket_id: str, prompt: str):
+        try:
+            with st.spinner("Updating bucket..."):
+                if not self.bucket_manager.update_bucket(bucket_id, prompt=prompt):
+                    st.error("Failed to update bucket")
+                    return
+                st.session_state.buckets = self.bucket_manager.get_all_buckets()
+            self._start_recategorization(BucketChange.UPDATED, bucket_id)
+            st.success("✅ Bucket updated")
+        except Exception as e:
+            st.error(f"Failed to update bucket: {str(e)}")
+    
     def _fetch_and_categorize_emails(self):
+        #the profile spans the whole batch, the scheduler ends it once it settles
+        run = begin_run('fetch', self.config.profiling)
         try:
             buckets = self.bucket_manager.get_all_buckets()
             st.session_state.buckets = buckets
@@ -316,30 +729,50 @@ class EmailApp:
             
             st.info(f"📬 Found {len(emails)} unread emails")
             
-            #categorize emails
+            #first page first, the rest continues in the background
+            newest_first = sorted(emails, key=lambda e: e.date, reverse=True)
+            visible_uids = [email.uid for email in newest_first[:EMAILS_PER_PAGE]]
+            if run is not None:
+                run.detach()
+            self.scheduler.submit(emails, buckets, visible_uids, profile_run=run)
+            run = None
+            
             with st.spinner("🤖 Categorizing emails with AI..."):
-                progress_bar = st.progress(0)
-                categorized = []
-                
-                for i, email in enumerate(emails):
-                    cat_email = self.categorizer.categorize_email(email, buckets)
-                    categorized.append(cat_email)
-                    progress_bar.progress((i + 1) / len(emails))
-                
-                progress_bar.empty()
+                self.scheduler.wait_for(visible_uids)
             
-            st.session_state.categorized_emails = categorized
+            st.session_state.scheduled = True
+            st.session_state.page = 0
+            st.session_state.categorized_emails = self.scheduler.results()
             st.session_state.emails_loaded = True
             
-            st.success(f"✅ Categorized {len(categorized)} emails successfully!")
+            remaining = self.scheduler.pending_count
+            if remaining:
+                st.success(f"✅ First {len(visible_uids)} emails ready, {remaining} more in the background")
+            else:
+                st.success(f"✅ Categorized {len(emails)} emails successfully!")
         
         except Exception as e:
             st.error(f"Error: {str(e)}")
             logging.exception("Email fetch/categorization error")
+        finally:
+            #still set only if the fetch ended before reaching the scheduler
+            end_run(run)
     
     def run(self):
         self.render_sidebar()
         self.render_main_area()
+        
+        #poll startup and the background queue without holding up user interaction;
+        #only views that show queue progress poll, not search results
+        pending = st.session_state.get('scheduled') and self.scheduler and \
+            (self.scheduler.pending_count or self.scheduler.deferred_count)
+        selected = st.session_state.selected_email
+        if selected is None:
+            watching = not st.session_state.get('search_query')
+        else:
+            watching = selected.bucket_id == BucketCategory.PENDING.value
+        if AUTO_REFRESH_SECONDS > 0 and ((pending and watching) or not self.backends.settled):
+            _autorefresh(interval_ms=int(AUTO_REFRESH_SECONDS * 1000), key="autorefresh", default=0)
 
 
 def main():
@@ -0,0 +1,176 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from config import AppConfig
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+#a backend still starting after this long is marked failed so it can be retried
+STARTUP_TIMEOUT = float(os.getenv('AUTOKITE_STARTUP_TIMEOUT', '120'))
+
+
+@dataclass
+class BackendStatus:
+    name: str
+    state: str = STARTING
+    detail: str = ""
+    seconds: float = 0.0
+
+
+class Backends:
+    #builds BucketManager and EmailCategorizer off the render path so the
+    #ui can come up before chromadb and ollama are ready
+
+    def __init__(self, config: AppConfig, startup_timeout: float = STARTUP_TIMEOUT):
+        from history import CategorizationHistory
+
+        self.config = config
+        self.bucket_manager = None
+        self.categorizer = None
+        #usable right away, lookups start hitting once the log is loaded
+        self.history = CategorizationHistory(config.history) if config.history.enabled else None
+        self.status: Dict[str, BackendStatus] = {
+            'chroma': BackendStatus(name="ChromaDB"),
+            'ollama': BackendStatus(name="Ollama"),
+            'history': BackendStatus(name="History")
+        }
+        self.startup_timeout = startup_timeout
+        self._lock = threading.Lock()
+        #only the latest starter of each backend may report its status
+        self._threads: Dict[str, Optional[threading.Thread]] = {}
+        self._deadlines: Dict[str, float] = {}
+
+        self._starters = {
+            'chroma': self._start_chroma,
+            'ollama': self._start_ollama,
+            'history': self._start_history
+        }
+        with self._lock:
+            for key in self._starters:
+                self._spawn(key)
+
+    def _spawn(self, key: str):
+        #requires self._lock, so the new deadline lands with the STARTING state
+        thread = threading.Thread(target=self._starters[key], name=f"start-{key}", daemon=True)
+        self._threads[key] = thread
+        self._deadlines[key] = time.monotonic() + self.startup_timeout
+        thread.start()
+
+    def _expire(self):
+        #requires self._lock; a starter stuck past its deadline is disowned
+        now = time.monotonic()
+        for key, status in self.status.items():
+            if status.state == STARTING and now >= self._deadlines[key]:
+                logger.error(f"{status.name} startup timed out after {self.startup_timeout:g}s")
+                status.state = FAILED
+                status.detail = f"Timed out after {self.startup_timeout:g}s"
+                status.seconds = self.startup_timeout
+                self._threads[key] = None
+
+    def _deadline(self, key: str) -> float:
+        with self._lock:
+            return self._deadlines[key]
+
+    def restart(self, key: str) -> bool:
+        #this object is cached for the whole process, so a failed startup
+        #would otherwise stick until it restarts
+        with self._lock:
+            status = self.status[key]
+            if status.state != FAILED:
+                return False
+            status.state = STARTING
+            status.detail = "Retrying..."
+            self._spawn(key)
+        logger.info(f"Restarting {status.name} backend")
+        return True
+
+    @property
+    def settled(self) -> bool:
+        with self._lock:
+            self._expire()
+            return all(status.state != STARTING for status in self.status.values())
+
+    def get_status(self) -> Dict[str, BackendStatus]:
+        with self._lock:
+            self._expire()
+            return {key: BackendStatus(**vars(status)) for key, status in self.status.items()}
+
+    def _set(self, key: str, state: str, detail: str, started: Optional[float] = None):
+        with self._lock:
+            if self._threads.get(key) is not threading.current_thread():
+                return
+            status = self.status[key]
+            status.state = state
+            status.detail = detail
+            if started is not None:
+                status.seconds = time.monotonic() - started
+
+    def _start_chroma(self):
+        started = time.monotonic()
+        try:
+            from bucket_manager import BucketManager
+
+            self._set('chroma', STARTING, "Opening database...")
+            manager = BucketManager(self.config.chroma)
+            self.bucket_manager = manager
+            self._set('chroma', READY, f"{manager.get_bucket_count()} buckets", started)
+
+            #search filters come up in the background as well
+            manager.warm_search_index()
+
+        except Exception as e:
+            logger.error(f"ChromaDB startup failed: {str(e)}")
+            self._set('chroma', FAILED, str(e), started)
+
+    def _start_ollama(self):
+        started = time.monotonic()
+        try:
+            from categorization_service import connect_or_start, STARTING as SERVICE_STARTING
+
+            #the shared service owns ollama; this process only talks to it
+            self._set('ollama', STARTING, "Connecting to categorization service...")
+            client = connect_or_start(self.config.ollama, self.config.service)
+            self.categorizer = client
+
+            #a running service that failed its ollama checks earlier tries again
+            if client.health()['ollama']['state'] == FAILED:
+                client.revalidate()
+
+            deadline = self._deadline('ollama')
+            while True:
+                ollama = client.health()['ollama']
+                if ollama['state'] != SERVICE_STARTING:
+                    break
+                if time.monotonic() >= deadline:
+                    self._set('ollama', FAILED, f"Timed out after {self.startup_timeout:g}s: {ollama['detail']}", started)
+                    return
+                self._set('ollama', STARTING, ollama['detail'])
+                time.sleep(0.5)
+
+            state = READY if ollama['state'] == READY else FAILED
+            self._set('ollama', state, ollama['detail'], started)
+
+        except Exception as e:
+            logger.error(f"Ollama startup failed: {str(e)}")
+            self._set('ollama', FAILED, str(e), started)
+
+    def _start_history(self):
+        started = time.monotonic()
+        if self.history is None:
+            self._set('history', READY, "Disabled", started)
+            return
+        try:
+            self._set('history', STARTING, "Loading past results...")
+            table = self.history.load()
+            self._set('history', READY, f"{len(table)} past results", started)
+        except Exception as e:
+            logger.error(f"History load failed: {str(e)}")
+            self._set('history', FAILED, str(e), started)
@@ -0,0 +1,108 @@
+"""Moving a bucket set between deployments.
+
+Creates a taxonomy one bucket at a time through BucketManager.create_bucket
+(the sidebar path), exports it as a bundle, then imports the bundle into a
+fresh database twice: once under the same embedding model, reusing the
+precomputed embeddings, and once forced to re-embed every prompt. The target
+is 1,000 buckets imported in seconds.
+
+Re-embed timings are only meaningful with chroma's real ONNX model; when it
+was not loaded (no download, or an embedder substituted in a sandbox) the
+output says so.
+
+    python benchmarks/bench_bucket_bundle.py [--buckets 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bucket_manager import BucketManager
+from config import ChromaConfig
+from models import BucketBundle
+
+WORDS = ('invoice payment overdue contract renewal meeting agenda travel booking flight hotel '
+         'security alert password reset newsletter weekly digest shipping delayed order refund '
+         'interview candidate offer payroll tax report quarterly review deadline budget').split()
+
+
+def make_prompt(rng: random.Random) -> str:
+    return f"All emails about {' '.join(rng.choices(WORDS, k=12))}"
+
+
+def fresh_manager(root: Path, name: str) -> BucketManager:
+    return BucketManager(ChromaConfig(persist_directory=root / name))
+
+
+def real_model_used() -> bool:
+    #the default embedder downloads its onnx model on first use
+    from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+
+    model = os.path.join(ONNXMiniLM_L6_V2.DOWNLOAD_PATH, ONNXMiniLM_L6_V2.EXTRACTED_FOLDER_NAME, 'model.onnx')
+    return os.path.exists(model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--buckets', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    prompts = [make_prompt(rng) for _ in range(args.buckets)]
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+
+        source = fresh_manager(root, 'source')
+        start = time.perf_counter()
+        for i in range(args.buckets):
+            source.create_bucket(f"Bucket {i}", prompts[i])
+        created = time.perf_counter() - start
+
+        path = root / 'buckets.json.gz'
+        start = time.perf_counter()
+        source.export_buckets(path)
+        exported = time.perf_counter() - start
+
+        target = fresh_manager(root, 'reuse')
+        start = time.perf_counter()
+        reuse_stats = target.import_buckets(path)
+        reused = time.perf_counter() - start
+
+        #same bundle, but recorded under another model name
+        bundle = BucketBundle.from_bytes(path.read_bytes())
+        bundle.embedding_model = 'other-model'
+        other = fresh_manager(root, 'reembed')
+        start = time.perf_counter()
+        reembed_stats = other.import_bundle(bundle)
+        reembedded = time.perf_counter() - start
+
+        #the embedding function alone, no cache and no database writes
+        embed = other._embedding_function
+        batch_size = other.config.embedding_batch_size
+        start = time.perf_counter()
+        for i in range(0, len(prompts), batch_size):
+            embed(prompts[i:i + batch_size])
+        embedding = time.perf_counter() - start
+
+        assert target.get_bucket_count() == other.get_bucket_count() == args.buckets
+
+        print(f"{args.buckets} buckets, bundle {path.stat().st_size / 1024:.0f} KiB "
+              f"({source.embedding_model})")
+        print(f"{'path':<28}{'seconds':>10}{'embedded':>10}")
+        print(f"{'create_bucket one by one':<28}{created:>10.2f}{args.buckets:>10}")
+        print(f"{'export':<28}{exported:>10.2f}{0:>10}")
+        print(f"{'import, same model':<28}{reused:>10.2f}{reuse_stats['embedded']:>10}")
+        print(f"{'import, other model':<28}{reembedded:>10.2f}{reembed_stats['embedded']:>10}")
+        print(f"{'embedding function only':<28}{embedding:>10.2f}{len(prompts):>10}")
+        if not real_model_used():
+            print(f"NOTE: {source.embedding_model}'s onnx model was never loaded, so these embeddings "
+                  f"came from a substitute; create and re-embed timings are not the real model's")
+
+
+if __name__ == '__main__':
+    main()
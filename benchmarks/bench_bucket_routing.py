@@ -0,0 +1,98 @@
+"""Per-email categorization latency against bucket count, with and without
+the embedding shortlist.
+
+By default this runs against a stub Ollama whose latency grows with prompt
+length (a rough stand-in for prompt processing cost). Pass ``--host`` to
+measure a real Ollama server instead.
+
+    python benchmarks/bench_bucket_routing.py [--host http://localhost:11434]
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bucket_manager import BucketManager
+from categorizer import EmailCategorizer
+from config import ChromaConfig, OllamaConfig
+from models import EmailMessage
+from stub_ollama import StubOllama
+
+TOPICS = ['invoices', 'travel', 'hiring', 'security alerts', 'newsletters', 'support tickets',
+          'legal review', 'payroll', 'conference', 'shipping', 'expense reports', 'onboarding']
+
+
+def make_buckets(manager: BucketManager, count: int):
+    for i in range(count):
+        topic = TOPICS[i % len(TOPICS)]
+        manager.create_bucket(
+            f"{topic.title()} #{i}",
+            f"Emails about {topic}, variant {i}: requests, follow-ups and notifications "
+            f"regarding {topic} for team {i % 17}."
+        )
+    return manager.get_all_buckets()
+
+
+def make_emails(count: int):
+    return [
+        EmailMessage(
+            uid=str(i),
+            subject=f"Question about {TOPICS[i % len(TOPICS)]}",
+            sender=f"user{i}@example.com",
+            date=datetime.now(),
+            body=f"Hi, following up on the {TOPICS[i % len(TOPICS)]} thread from last week. " * 3,
+            snippet=""
+        )
+        for i in range(count)
+    ]
+
+
+def time_per_email(manager, categorizer, emails, buckets, top_k):
+    latencies = []
+    for email in emails:
+        start = time.perf_counter()
+        candidates = manager.shortlist_buckets(email, buckets, top_k)
+        categorizer.categorize_email(email, candidates)
+        latencies.append(time.perf_counter() - start)
+    return statistics.mean(latencies) * 1000, statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--model', default='phi3.5')
+    parser.add_argument('--emails', type=int, default=20)
+    parser.add_argument('--top-k', type=int, default=8)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500])
+    args = parser.parse_args()
+
+    stub = None
+    host = args.host
+    if host is None:
+        stub = StubOllama(latency=0.05, per_char_latency=2e-5).start()
+        host = stub.url
+
+    categorizer = EmailCategorizer(OllamaConfig(model=args.model, hosts=[host], health_check_interval=0))
+    emails = make_emails(args.emails)
+
+    print(f"{'buckets':>8}{'full mean ms':>14}{'full p50 ms':>13}{'routed mean ms':>16}{'routed p50 ms':>15}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = BucketManager(ChromaConfig(persist_directory=Path(tmp)))
+            buckets = make_buckets(manager, size)
+            full = time_per_email(manager, categorizer, emails, buckets, 0)
+            routed = time_per_email(manager, categorizer, emails, buckets, args.top_k)
+            print(f"{size:>8}{full[0]:>14.1f}{full[1]:>13.1f}{routed[0]:>16.1f}{routed[1]:>15.1f}")
+
+    categorizer.pool.close()
+    if stub:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
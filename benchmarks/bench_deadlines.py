@@ -0,0 +1,108 @@
+"""Batch latency with stalled Ollama requests, before and after deadlines,
+hedging and the circuit breaker.
+
+"tail": two hosts, 5% of chat requests stall for --stall seconds.
+"hung": one host that accepts every request and never answers in time.
+
+"before" has no request timeout, no hedging and no breaker, like the old
+client; "after" uses the defaults from OllamaConfig with a short timeout.
+
+    python benchmarks/bench_deadlines.py [--emails 60] [--stall 10]
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from categorizer import EmailCategorizer, DEFERRED_TIER
+from config import OllamaConfig
+from models import Bucket, EmailMessage
+from ollama_pool import Deadline
+from stub_ollama import StubOllama
+
+
+def make_inbox(count: int):
+    base = datetime(2026, 1, 1)
+    return [
+        EmailMessage(uid=str(i), subject=f"Order {i} shipped", sender="shop@example.com",
+                     date=base + timedelta(minutes=i), body=f"Order {i} is on its way.", snippet="")
+        for i in range(count)
+    ]
+
+
+def run_batch(categorizer, emails, buckets, deadline_seconds, workers=2):
+    deadline = Deadline(deadline_seconds) if deadline_seconds else None
+    latencies = []
+
+    def categorize(email):
+        start = time.perf_counter()
+        result = categorizer.categorize_email(email, buckets, deadline)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(categorize, emails))
+    wall = time.perf_counter() - start
+    deferred = sum(1 for r in results if r.model_tier == DEFERRED_TIER)
+    return wall, latencies, deferred
+
+
+def configs(hosts, stall):
+    before = OllamaConfig(hosts=hosts, health_check_interval=0, request_timeout=stall * 10,
+                          hedge_quantile=0, breaker_threshold=0)
+    after = OllamaConfig(hosts=hosts, health_check_interval=0, request_timeout=2.0)
+    return (('before', before, 0), ('after', after, 60))
+
+
+def report(scenario, mode, wall, latencies, deferred):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{scenario:<7}{mode:<8}{wall:>9.2f}{statistics.median(latencies):>9.2f}"
+          f"{p95:>9.2f}{latencies[-1]:>9.2f}{deferred:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--emails', type=int, default=60)
+    parser.add_argument('--stall', type=float, default=10.0)
+    args = parser.parse_args()
+
+    random.seed(7)
+    buckets = [Bucket(id=str(i), title=f"Bucket {i}", prompt=f"Topic {i}", created_at=datetime(2026, 1, 1))
+               for i in range(5)]
+    emails = make_inbox(args.emails)
+    warmup = make_inbox(25)
+
+    print(f"{'':<15}{'batch s':>9}{'p50 s':>9}{'p95 s':>9}{'max s':>9}{'deferred':>10}")
+
+    stubs = [StubOllama(latency=0.2).start() for _ in range(2)]
+    for mode, config, deadline in configs([s.url for s in stubs], args.stall):
+        categorizer = EmailCategorizer(config)
+        #fill the latency window the hedge threshold comes from
+        run_batch(categorizer, warmup, buckets, 0)
+        for stub in stubs:
+            stub.stall_rate, stub.stall_seconds = 0.05, args.stall
+        report('tail', mode, *run_batch(categorizer, emails, buckets, deadline))
+        for stub in stubs:
+            stub.stall_rate = 0.0
+        categorizer.pool.close()
+
+    hung = StubOllama(latency=0.2, stall_rate=1.0, stall_seconds=args.stall).start()
+    for mode, config, deadline in configs([hung.url], args.stall):
+        categorizer = EmailCategorizer(config)
+        report('hung', mode, *run_batch(categorizer, emails[:12], buckets, deadline))
+        categorizer.pool.close()
+
+    for stub in stubs + [hung]:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
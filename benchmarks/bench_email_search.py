@@ -0,0 +1,119 @@
+"""Search latency over the email index.
+
+Indexes synthetic categorized emails through BucketManager.index_emails, then
+times search_emails with and without metadata filters. The target is under
+100 ms per query at 100k indexed emails.
+
+    python benchmarks/bench_email_search.py [--emails 100000] [--persist-dir DIR]
+
+Filling 100k emails with the default ONNX embedder takes several minutes;
+pass --persist-dir to keep the index around and skip the fill on reruns.
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bucket_manager import BucketManager
+from config import ChromaConfig
+from models import CategorizedEmail, EmailMessage
+
+BASE_DATE = datetime(2026, 1, 1)
+WORDS = ('invoice payment overdue contract renewal meeting agenda travel booking flight hotel '
+         'security alert password reset newsletter weekly digest shipping delayed order refund '
+         'interview candidate offer payroll tax report quarterly review deadline budget').split()
+BUCKETS = ['finance', 'legal', 'travel', 'security', 'newsletters', 'shipping', 'hiring', 'reports']
+
+
+def make_batch(start: int, count: int, rng: random.Random):
+    batch = []
+    for i in range(start, start + count):
+        subject = ' '.join(rng.choices(WORDS, k=5)).capitalize()
+        bucket = BUCKETS[i % len(BUCKETS)]
+        batch.append(CategorizedEmail(
+            email=EmailMessage(
+                uid=str(i),
+                subject=subject,
+                sender=f"sender{i % 500}@example.com",
+                date=BASE_DATE - timedelta(minutes=i),
+                body='',
+                snippet=' '.join(rng.choices(WORDS, k=30))
+            ),
+            bucket_id=bucket,
+            bucket_title=bucket.title(),
+            summary=' '.join(rng.choices(WORDS, k=12)),
+            confidence=rng.random()
+        ))
+    return batch
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--emails', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--persist-dir', default=None)
+    args = parser.parse_args()
+
+    tmp = None
+    persist_dir = args.persist_dir
+    if persist_dir is None:
+        tmp = tempfile.TemporaryDirectory()
+        persist_dir = tmp.name
+
+    manager = BucketManager(ChromaConfig(persist_directory=Path(persist_dir)))
+    rng = random.Random(7)
+
+    indexed = manager.get_indexed_email_count()
+    if indexed < args.emails:
+        start = time.perf_counter()
+        for offset in range(indexed, args.emails, 5000):
+            manager.index_emails(make_batch(offset, min(5000, args.emails - offset), rng))
+        print(f"Indexed {args.emails - indexed} emails in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        manager.index_emails(make_batch(0, 5000, random.Random(7)))
+        print(f"Re-indexed 5000 unchanged emails in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    manager.warm_search_index()
+    manager.search_emails('warm up', n_results=10)
+    print(f"Search index warm-up took {time.perf_counter() - start:.1f}s")
+
+    now = BASE_DATE
+    cases = {
+        'no filter': {},
+        'bucket': {'bucket_id': 'finance'},
+        'sender': {'sender': 'sender42@example.com'},
+        'date range': {'date_from': now - timedelta(days=7), 'date_to': now},
+        'bucket + date': {'bucket_id': 'travel', 'date_from': now - timedelta(days=30)},
+    }
+
+    print(f"{manager.get_indexed_email_count()} emails indexed")
+    print(f"{'filter':<16}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, filters in cases.items():
+        latencies = []
+        for _ in range(args.queries):
+            query = ' '.join(rng.choices(WORDS, k=4))
+            start = time.perf_counter()
+            manager.search_emails(query, n_results=10, **filters)
+            latencies.append((time.perf_counter() - start) * 1000)
+        print(f"{name:<16}{statistics.median(latencies):>10.1f}"
+              f"{percentile(latencies, 0.95):>10.1f}{max(latencies):>10.1f}")
+
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
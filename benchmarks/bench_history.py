@@ -0,0 +1,125 @@
+"""Categorization history: write, reload and query N rows, against a JSON
+lines log of CategorizedEmail.to_dict as the baseline.
+
+Rows are written in blocks of --batch (one fetch each) with timestamps spread
+over a year, 40 buckets, 2 models and a few thousand senders.
+
+    python benchmarks/bench_history.py [--rows 1000000] [--batch 50]
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import HistoryConfig
+from history import CategorizationHistory, encode_block
+from models import CategorizedEmail, EmailMessage
+
+BASE = datetime(2026, 1, 1)
+
+
+def make_rows(start: int, count: int, rng: random.Random):
+    rows = []
+    for i in range(start, start + count):
+        bucket = rng.randrange(40)
+        model = 'phi3.5' if rng.random() < 0.9 else 'llama3.1:8b'
+        recorded = BASE + timedelta(seconds=i * 31_536_000 // 1_000_000)
+        rows.append((
+            recorded.timestamp(),
+            (recorded - timedelta(minutes=rng.randrange(600))).timestamp(),
+            round(rng.random(), 2),
+            rng.lognormvariate(0, 0.5) * (1.0 if model == 'phi3.5' else 3.0),
+            f"bucket-{bucket}",
+            f"Bucket {bucket}",
+            model,
+            'primary' if model == 'phi3.5' else 'escalated',
+            'fetch',
+            f"sender{rng.randrange(5000)}@example.com",
+            f"uid-{i}",
+            f"Subject line for message number {i}",
+            f"A one or two sentence summary of message {i}, mentioning an invoice and a date."
+        ))
+    return rows
+
+
+def as_json(row) -> str:
+    return json.dumps({
+        'email': {'uid': row[10], 'subject': row[11], 'sender': row[9],
+                  'date': datetime.fromtimestamp(row[1]).isoformat(), 'body': '', 'snippet': ''},
+        'bucket_id': row[4], 'bucket_title': row[5], 'summary': row[12],
+        'confidence': row[2], 'model_tier': row[7], 'model': row[6], 'latency': row[3]
+    })
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {label:<40}{time.perf_counter() - start:>8.2f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        history = CategorizationHistory(HistoryConfig(directory=Path(tmp) / 'history'))
+        jsonl = Path(tmp) / 'history.jsonl'
+
+        print(f"{args.rows} rows in blocks of {args.batch}")
+        write_history = 0.0
+        write_json = 0.0
+        with open(jsonl, 'w') as f:
+            for start in range(0, args.rows, args.batch):
+                rows = make_rows(start, min(args.batch, args.rows - start), rng)
+                t = time.perf_counter()
+                history._append(encode_block(rows))
+                write_history += time.perf_counter() - t
+                t = time.perf_counter()
+                f.write(''.join(as_json(row) + '\n' for row in rows))
+                write_json += time.perf_counter() - t
+
+        history_bytes = sum(p.stat().st_size for p in history.segments())
+        print(f"  {'write, columnar log':<40}{write_history:>8.2f} s  {history_bytes / 1e6:>8.1f} MB")
+        print(f"  {'write, json lines':<40}{write_json:>8.2f} s  {jsonl.stat().st_size / 1e6:>8.1f} MB")
+
+        print("reload")
+        table = timed('columnar log (mmap, + uid index)', history.load)
+
+        def load_json():
+            results = []
+            with open(jsonl) as f:
+                for line in f:
+                    data = json.loads(line)
+                    data.pop('latency')
+                    results.append(CategorizedEmail.from_dict(data))
+            return results
+        timed('json lines -> CategorizedEmail', load_json)
+
+        print("queries on the columnar table")
+        emails = []
+        for row in rng.sample(range(len(table)), 50):
+            fields = table.record(row)
+            emails.append(EmailMessage(uid=fields['uid'], subject=fields['subject'], sender=fields['sender'],
+                                       date=datetime.fromtimestamp(fields['email_date']), body='', snippet=''))
+        found = timed('lookup 50 emails', lambda: [history.lookup(email) for email in emails])
+        assert all(found), "history lookup missed a recorded email"
+        timed('count by bucket', lambda: table.count_by('bucket_title'))
+        timed('mean confidence by bucket', lambda: table.mean_by('confidence', 'bucket_title'))
+        timed('latency p50/p95/p99 by model', lambda: table.quantiles('latency', key='model'))
+        last_week = timed('select last 7 days', lambda: table.select(since=BASE + timedelta(days=358)))
+        timed('count by bucket, last 7 days', lambda: table.count_by('bucket_title', last_week))
+        timed('rows per day', table.daily_counts)
+
+
+if __name__ == '__main__':
+    main()
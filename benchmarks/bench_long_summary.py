@@ -0,0 +1,75 @@
+"""Full-body summary latency against body length: one prompt with the whole
+body versus chunked map-reduce, plus the cost of reopening a summarized email.
+
+Each stub host handles two requests at a time and charges a fixed 0.5 s for
+generation plus prefill time proportional to the prompt length.
+
+    python benchmarks/bench_long_summary.py [--hosts 2] [--per-char 0.0001]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import OllamaConfig
+from models import EmailMessage
+from ollama_pool import OllamaHostPool
+from summarizer import LongEmailSummarizer, estimate_tokens, split_chunks
+from stub_ollama import StubOllama
+
+PARAGRAPH = ("The supplier agrees to deliver the goods listed in schedule A by the dates agreed "
+             "with the buyer, and any delay beyond ten business days entitles the buyer to a credit "
+             "of two percent of the order value per week of delay.")
+
+
+def make_email(length: int) -> EmailMessage:
+    paragraphs = []
+    while sum(len(p) + 2 for p in paragraphs) < length:
+        paragraphs.append(f"Clause {len(paragraphs) + 1}. {PARAGRAPH}")
+    body = "\n\n".join(paragraphs)[:length]
+    return EmailMessage(uid=str(length), subject="Master supply agreement", sender="legal@example.com",
+                        date=datetime(2026, 1, 1), body=body, snippet=body[:200])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hosts', type=int, default=2)
+    parser.add_argument('--per-char', type=float, default=0.0001)
+    args = parser.parse_args()
+
+    stubs = [StubOllama(latency=0.5, per_char_latency=args.per_char, parallel=2).start()
+             for _ in range(args.hosts)]
+    config = OllamaConfig(hosts=[s.url for s in stubs], health_check_interval=0)
+    pool = OllamaHostPool(config.hosts, health_check_interval=0)
+
+    print(f"{'body chars':>10}{'tokens':>8}{'chunks':>8}{'single s':>10}{'map-reduce s':>14}{'reopen ms':>11}")
+    for length in (1_000, 4_000, 16_000, 64_000, 128_000):
+        email = make_email(length)
+
+        start = time.perf_counter()
+        pool.chat(model=config.model,
+                  messages=[{'role': 'user', 'content': f"Summarize this email:\n\n{email.body}"}])
+        single = time.perf_counter() - start
+
+        summarizer = LongEmailSummarizer(pool, config)
+        start = time.perf_counter()
+        summarizer.summarize(email)
+        chunked = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summarizer.summarize(email)
+        reopen = time.perf_counter() - start
+
+        chunks = len(split_chunks(email.body, config.summary_chunk_tokens))
+        print(f"{length:>10}{estimate_tokens(email.body):>8}{chunks:>8}"
+              f"{single:>10.2f}{chunked:>14.2f}{reopen * 1000:>11.2f}")
+
+    for stub in stubs:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Exercise OllamaHostPool against several local stub servers.
+
+First checks routing and failover on small pools: fewest-outstanding
+routing, retry on another host, ejection after max_failures and re-admission
+by check_health. Then starts three stubs with different latencies, takes one
+of them down halfway through the run and brings it back, and prints per-host
+stats.
+
+    python benchmarks/bench_ollama_pool.py
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import ollama
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ollama_pool import OllamaHostPool
+from stub_ollama import StubOllama
+
+
+class RecordingClient:
+    #the real client, noting which host each chat call went to
+
+    def __init__(self, host: str, calls: list):
+        self.host = host
+        self.calls = calls
+        self._client = ollama.Client(host=host, timeout=10)
+
+    def chat(self, **kwargs):
+        self.calls.append(self.host)
+        return self._client.chat(**kwargs)
+
+    def list(self):
+        return self._client.list()
+
+
+def recording_pool(stubs, calls: list, **kwargs) -> OllamaHostPool:
+    #no hedging and no background health checks, so routing is deterministic
+    kwargs.setdefault('health_check_interval', 0)
+    return OllamaHostPool([s.url for s in stubs], hedge_quantile=0,
+                          client_factory=lambda host: RecordingClient(host, calls), **kwargs)
+
+
+def chat(pool: OllamaHostPool, text: str = 'hello'):
+    return pool.chat(model='phi3.5', messages=[{'role': 'user', 'content': text}])
+
+
+def stats_for(pool: OllamaHostPool, stub: StubOllama) -> dict:
+    return next(s for s in pool.get_stats() if s['host'] == stub.url)
+
+
+def wait_until(condition, timeout: float = 5.0):
+    #bounded poll, for state another thread is about to reach
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, f"condition not met within {timeout:g}s"
+        time.sleep(0.01)
+
+
+def check_routing():
+    #a new call goes to the host with the fewest calls outstanding
+    slow, fast = StubOllama(latency=2.0).start(), StubOllama(latency=0.01).start()
+    calls = []
+    pool = recording_pool([slow, fast], calls)
+
+    blocked = threading.Thread(target=chat, args=(pool,))
+    blocked.start()
+    #in_flight counts from host selection, the call itself follows shortly
+    wait_until(lambda: stats_for(pool, slow)['in_flight'] == 1 and calls)
+    assert calls == [slow.url], calls
+
+    for _ in range(3):
+        chat(pool)
+    assert calls[1:] == [fast.url] * 3, calls
+    #otherwise the fast calls could have been routed with the slow host idle
+    assert stats_for(pool, slow)['in_flight'] == 1
+
+    blocked.join()
+    assert stats_for(pool, slow)['in_flight'] == 0
+    pool.close()
+    slow.stop()
+    fast.stop()
+
+
+def check_failover():
+    down, up = StubOllama(latency=0.01).start(), StubOllama(latency=0.01).start()
+    down.down = True
+    calls = []
+    pool = recording_pool([down, up], calls, max_failures=2, max_retries=1, retry_backoff=0)
+
+    #a failed attempt is retried on the other host
+    chat(pool)
+    assert calls == [down.url, up.url], calls
+    assert stats_for(pool, down)['healthy']
+
+    #max_failures in a row eject the host, after which it gets no calls
+    chat(pool)
+    assert calls[2:] == [down.url, up.url], calls
+    assert not stats_for(pool, down)['healthy']
+    del calls[:]
+    for _ in range(3):
+        chat(pool)
+    assert calls == [up.url] * 3, calls
+
+    #a health check that reaches it again re-admits it
+    pool.check_health()
+    assert not stats_for(pool, down)['healthy']
+    down.down = False
+    pool.check_health()
+    assert stats_for(pool, down)['healthy']
+    del calls[:]
+    chat(pool)
+    assert calls == [down.url], calls
+
+    pool.close()
+    down.stop()
+    up.stop()
+
+
+def main(requests: int = 300, workers: int = 12):
+    check_routing()
+    check_failover()
+    print("routing, retry, ejection and re-admission checks passed")
+
+    stubs = [StubOllama(latency=0.02).start(),
+             StubOllama(latency=0.05).start(),
+             StubOllama(latency=0.10).start()]
+    pool = OllamaHostPool([s.url for s in stubs], health_check_interval=0.2, max_failures=2)
+
+    def one(i: int):
+        if i == requests // 3:
+            stubs[0].down = True
+        if i == 2 * requests // 3:
+            stubs[0].down = False
+        return pool.chat(model='phi3.5', messages=[{'role': 'user', 'content': f'hello {i}'}])
+
+    start = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(one, i) for i in range(requests)]:
+            try:
+                future.result()
+            except Exception:
+                failed += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"{requests} requests in {elapsed:.2f}s ({requests / elapsed:.1f} req/s), {failed} failed")
+    print(f"{'host':<28}{'healthy':>8}{'requests':>10}{'failures':>10}{'avg ms':>10}{'req/s':>8}")
+    for stats in pool.get_stats():
+        print(f"{stats['host']:<28}{str(stats['healthy']):>8}{stats['requests']:>10}"
+              f"{stats['failures']:>10}{stats['avg_latency'] * 1000:>10.1f}{stats['throughput']:>8.1f}")
+
+    pool.close()
+    for stub in stubs:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
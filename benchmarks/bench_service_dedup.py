@@ -0,0 +1,112 @@
+"""Several sessions categorizing the same inbox at once, with and without the
+shared categorization service.
+
+Counts how many chat calls actually reach the (stub) Ollama backend and how
+long the sessions take overall, after checking that concurrent identical
+requests reach the backend only once.
+
+    python benchmarks/bench_service_dedup.py [--sessions 4] [--emails 20]
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from categorization_service import CategorizationClient, CategorizationService
+from categorizer import EmailCategorizer
+from config import OllamaConfig, ServiceConfig
+from models import Bucket, EmailMessage
+from stub_ollama import StubOllama
+
+
+def make_inbox(count: int):
+    base = datetime(2026, 1, 1)
+    return [
+        EmailMessage(uid=str(i), subject=f"Invoice {i} overdue", sender="billing@example.com",
+                     date=base + timedelta(minutes=i), body=f"Invoice {i} is overdue.", snippet="")
+        for i in range(count)
+    ]
+
+
+def run_sessions(make_categorizer, sessions: int, emails, buckets, workers: int = 2):
+    def session(_):
+        categorizer = make_categorizer()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda e: categorizer.categorize_email(e, buckets), emails))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        list(executor.map(session, range(sessions)))
+    return time.perf_counter() - start
+
+
+def check_dedup(service: CategorizationService, stub: StubOllama, buckets, concurrent: int = 8):
+    #identical requests arriving together share one backend call
+    client = CategorizationClient(ServiceConfig(port=service.port))
+    #the service warms the model up with a chat call of its own first
+    while service.health()['ollama']['state'] == 'starting':
+        time.sleep(0.05)
+    email = EmailMessage(uid='dedup', subject="Quarterly report due", sender="cfo@example.com",
+                         date=datetime(2026, 1, 1), body="Please send the report.", snippet="")
+    stats_before = dict(service.health()['service'])
+    before = stub.requests
+    with ThreadPoolExecutor(max_workers=concurrent) as executor:
+        results = list(executor.map(lambda _: client.categorize_email(email, buckets), range(concurrent)))
+    stats = service.health()['service']
+
+    assert stub.requests - before == 1, f"{stub.requests - before} backend calls for one email"
+    assert stats['executed'] - stats_before['executed'] == 1
+    shared = (stats['deduplicated'] - stats_before['deduplicated']) + \
+        (stats['cache_hits'] - stats_before['cache_hits'])
+    assert shared == concurrent - 1, stats
+    assert len({(r.bucket_id, r.summary, r.confidence) for r in results}) == 1
+    assert all(r.email.uid == email.uid for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sessions', type=int, default=4)
+    parser.add_argument('--emails', type=int, default=20)
+    args = parser.parse_args()
+
+    emails = make_inbox(args.emails)
+    buckets = [Bucket(id=str(i), title=f"Bucket {i}", prompt=f"Topic {i}", created_at=datetime(2026, 1, 1))
+               for i in range(5)]
+
+    stub = StubOllama(latency=0.2).start()
+    ollama_config = OllamaConfig(hosts=[stub.url], health_check_interval=0)
+
+    #each session with its own categorizer, as before
+    before = stub.requests
+    elapsed = run_sessions(lambda: EmailCategorizer(ollama_config), args.sessions, emails, buckets)
+    direct_calls = stub.requests - before
+
+    service = CategorizationService(ollama_config, ServiceConfig(port=0, workers=4)).start_in_thread()
+    client_config = ServiceConfig(port=service.port)
+    time.sleep(0.5)
+
+    check_dedup(service, stub, buckets)
+    print("concurrent identical requests: 1 backend call")
+
+    before = stub.requests
+    shared_elapsed = run_sessions(lambda: CategorizationClient(client_config), args.sessions, emails, buckets)
+    shared_calls = stub.requests - before
+
+    assert shared_calls == args.emails, f"{shared_calls} backend calls for {args.emails} distinct emails"
+
+    requested = args.sessions * args.emails
+    print(f"{args.sessions} sessions x {args.emails} emails = {requested} categorizations")
+    print(f"{'mode':<16}{'backend calls':>15}{'wall s':>10}")
+    print(f"{'per-session':<16}{direct_calls:>15}{elapsed:>10.2f}")
+    print(f"{'shared service':<16}{shared_calls:>15}{shared_elapsed:>10.2f}")
+    print(f"service stats: {service.health()['service']}")
+
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Cold-start cost: import time and time to first render.
+
+Each measurement runs in a fresh interpreter. "eager" reproduces the old
+startup path (import chromadb/ollama up front, open the persistent client
+and validate Ollama before anything renders); "lazy" is the current one,
+where the first render happens while backends start in the background.
+The stub Ollama takes 2 s to list models, like a busy inference box.
+
+    python benchmarks/bench_startup.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+RESULT_PREFIX = 'BENCH_RESULT '
+
+
+def measure(mode: str) -> float:
+    start = time.perf_counter()
+
+    if mode == 'import-eager':
+        import chromadb, ollama, imap_tools, bs4  # noqa: F401
+        import config, email_client, backends, recategorizer, scheduler  # noqa: F401
+
+    elif mode == 'import-lazy':
+        import config, email_client, backends, recategorizer, scheduler  # noqa: F401
+
+    elif mode == 'render-eager':
+        from streamlit.testing.v1 import AppTest  # noqa: F401
+        from config import get_config
+        from bucket_manager import BucketManager
+        from categorizer import EmailCategorizer
+        config = get_config()
+        manager = BucketManager(config.chroma)
+        manager.get_all_buckets()
+        EmailCategorizer(config.ollama).validate()
+
+    elif mode == 'render-lazy':
+        from streamlit.testing.v1 import AppTest
+        at = AppTest.from_file(str(ROOT / 'app.py'), default_timeout=60)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--mode', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(RESULT_PREFIX + json.dumps({'seconds': measure(args.mode)}))
+        return
+
+    from stub_ollama import StubOllama
+
+    #a busy ollama box: listing models takes a couple of seconds
+    stub = StubOllama(latency=0.5, list_latency=2.0).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            GMAIL_EMAIL=os.getenv('GMAIL_EMAIL', 'bench@example.com'),
+            GMAIL_APP_PASSWORD=os.getenv('GMAIL_APP_PASSWORD', 'bench'),
+            OLLAMA_HOST=stub.url,
+            CHROMA_PERSIST_DIRECTORY=tmp,
+            AUTOKITE_REFRESH_SECONDS='0'
+        )
+
+        print(f"{'measurement':<38}{'median s':>10}{'min s':>10}")
+        for mode, label in (('import-eager', 'imports, eager (before)'),
+                            ('import-lazy', 'imports, lazy (now)'),
+                            ('render-eager', 'first render, blocking init (before)'),
+                            ('render-lazy', 'first render, background init (now)')):
+            samples = []
+            for _ in range(args.repeat):
+                out = subprocess.run(
+                    [sys.executable, __file__, '--mode', mode],
+                    env=env, cwd=str(ROOT), capture_output=True, text=True, check=True
+                )
+                #the app logs to stdout too, so pick out our line
+                line = next(l for l in out.stdout.splitlines() if l.startswith(RESULT_PREFIX))
+                samples.append(json.loads(line[len(RESULT_PREFIX):])['seconds'])
+            print(f"{label:<38}{statistics.median(samples):>10.2f}{min(samples):>10.2f}")
+
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Minimal stand-in for the Ollama HTTP API, used by the benchmarks.
+
+Implements just enough of ``/api/tags``, ``/api/chat`` and ``/api/embeddings``
+for ``ollama.Client`` to talk to it. Latency can be fixed or scale with the
+prompt length, and the server can be told to fail or stall requests.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubOllama:
+
+    def __init__(self, latency: float = 0.05, per_char_latency: float = 0.0,
+                 fail_rate: float = 0.0, model: str = 'phi3.5', port: int = 0,
+                 list_latency: float = 0.0, parallel: int = 0,
+                 stall_rate: float = 0.0, stall_seconds: float = 30.0):
+        self.latency = latency
+        self.list_latency = list_latency
+        self.per_char_latency = per_char_latency
+        self.fail_rate = fail_rate
+        #a stalled request accepts the connection and answers very late
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.model = model
+        self.down = False
+        self.requests = 0
+        self._lock = threading.Lock()
+        #like OLLAMA_NUM_PARALLEL, 0 means unlimited
+        self._slots = threading.Semaphore(parallel) if parallel else None
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if stub.down:
+                    return self._reply(503, {'error': 'down'})
+                if self.path == '/api/tags':
+                    time.sleep(stub.list_latency)
+                    return self._reply(200, {'models': [{'name': f'{stub.model}:latest'}]})
+                self._reply(404, {'error': 'not found'})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                with stub._lock:
+                    stub.requests += 1
+                if stub.down or random.random() < stub.fail_rate:
+                    return self._reply(500, {'error': 'stub failure'})
+
+                if self.path == '/api/chat':
+                    prompt = ''.join(m.get('content', '') for m in request.get('messages', []))
+                    if random.random() < stub.stall_rate:
+                        time.sleep(stub.stall_seconds)
+                    if stub._slots:
+                        with stub._slots:
+                            time.sleep(stub.latency + stub.per_char_latency * len(prompt))
+                    else:
+                        time.sleep(stub.latency + stub.per_char_latency * len(prompt))
+                    return self._reply(200, {
+                        'model': request.get('model'),
+                        'message': {'role': 'assistant', 'content': stub.answer(prompt)},
+                        'done': True
+                    })
+
+                if self.path == '/api/embeddings':
+                    time.sleep(stub.latency)
+                    return self._reply(200, {'embedding': stub.embed(request.get('prompt', ''))})
+
+                self._reply(404, {'error': 'not found'})
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @staticmethod
+    def answer(prompt: str) -> str:
+        #deterministic pick so repeated runs are comparable
+        digest = int(hashlib.sha256(prompt.encode()).hexdigest(), 16)
+        if 'AVAILABLE BUCKETS' not in prompt:
+            return 'A short stub summary of the provided text.'
+        count = prompt.count('\n', prompt.find('AVAILABLE BUCKETS'), prompt.find('INSTRUCTIONS'))
+        return json.dumps({
+            'bucket_number': digest % max(1, count - 2) + 1,
+            'summary': 'Stub summary.',
+            'confidence': round((digest % 100) / 100, 2)
+        })
+
+    @staticmethod
+    def embed(text: str, dimension: int = 384) -> list:
+        rng = random.Random(text)
+        return [rng.uniform(-1, 1) for _ in range(dimension)]
+
+    def start(self) -> 'StubOllama':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--per-char-latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = StubOllama(latency=args.latency, per_char_latency=args.per_char_latency, port=args.port)
+    print(f'Stub Ollama listening on {stub.url}')
+    stub._server.serve_forever()
@@ -1,25 +1,102 @@
+import hashlib
 import logging
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Optional
-import chromadb
-from chromadb.config import Settings
+from pathlib import Path
+from typing import Dict, List, Optional, Union
 
-from models import Bucket
+from models import Bucket, BucketBundle, BucketChange, EmailMessage, CategorizedEmail, EmailSearchResult
 from config import ChromaConfig
 
 logger = logging.getLogger(__name__)
 
+#filtered search tuning, see BucketManager._nearest_allowed
+BRUTE_FORCE_LIMIT = 300
+OVERFETCH_FACTOR = 3
+MAX_OVERFETCH = 4000
+#a failed filter index load is tried again on a filtered search after this long
+FILTER_INDEX_RETRY_SECONDS = 60.0
+
+
+class _EmailFilterIndex:
+    #in-memory copy of the filterable email fields; chroma's own where
+    #filter loads every matching metadata row and gets slow past ~10k emails
+    
+    def __init__(self):
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._fields: Dict[str, tuple] = {}
+        self._by_bucket: Dict[str, set] = {}
+        self._by_sender: Dict[str, set] = {}
+    
+    def __len__(self) -> int:
+        return len(self._fields)
+    
+    def put(self, uid: str, metadata: Dict):
+        with self._lock:
+            self._discard(uid)
+            fields = (metadata['bucket_id'], metadata['sender_key'], metadata['date_ts'])
+            self._fields[uid] = fields
+            self._by_bucket.setdefault(fields[0], set()).add(uid)
+            self._by_sender.setdefault(fields[1], set()).add(uid)
+    
+    def remove(self, uid: str):
+        with self._lock:
+            self._discard(uid)
+    
+    def _discard(self, uid: str):
+        fields = self._fields.pop(uid, None)
+        if fields:
+            self._by_bucket.get(fields[0], set()).discard(uid)
+            self._by_sender.get(fields[1], set()).discard(uid)
+    
+    def match(self, bucket_id: Optional[str], sender_key: Optional[str],
+              ts_from: Optional[float], ts_to: Optional[float]) -> set:
+        with self._lock:
+            candidates = None
+            if bucket_id:
+                candidates = set(self._by_bucket.get(bucket_id, ()))
+            if sender_key:
+                senders = self._by_sender.get(sender_key, set())
+                candidates = senders.copy() if candidates is None else candidates & senders
+            if candidates is None:
+                candidates = self._fields.keys()
+            
+            if ts_from is None and ts_to is None:
+                return set(candidates)
+            
+            lower = ts_from if ts_from is not None else float('-inf')
+            upper = ts_to if ts_to is not None else float('inf')
+            return {uid for uid in candidates if lower <= self._fields[uid][2] <= upper}
+
 
 class BucketManager:
     def __init__(self, config: ChromaConfig):
         self.config = config
         self._client = None
         self._collection = None
+        self._email_collection = None
+        self._embedding_function = None
+        self._embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._embedding_lock = threading.Lock()
+        self._filter_index = _EmailFilterIndex()
+        self._filter_index_lock = threading.Lock()
+        self._filter_index_thread = None
+        #index_emails updates made while a load runs, replayed after the swap
+        self._filter_index_pending: Optional[List[tuple]] = None
+        self._filter_index_retry_at = 0.0
         self._initialize()
     
     def _initialize(self):
         try:
+            #chromadb is slow to import, keep it off the startup path
+            import chromadb
+            from chromadb.config import Settings
+            from chromadb.utils import embedding_functions
+            
             self._client = chromadb.PersistentClient(
                 path=str(self.config.persist_directory),
                 settings=Settings(
@@ -28,12 +105,22 @@ class BucketManager:
                 )
             )
             
+            self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+            
             self._collection = self._client.get_or_create_collection(
                 name=self.config.collection_name,
-                metadata={"description": "Email categorization buckets"}
+                metadata={"description": "Email categorization buckets"},
+                embedding_function=self._embedding_function
+            )
+            
+            self._email_collection = self._client.get_or_create_collection(
+                name=self.config.email_collection_name,
+                metadata={"description": "Processed email search index"},
+                embedding_function=self._embedding_function
             )
             
-            logger.info(f"Initialized ChromaDB collection: {self.config.collection_name}")
+            logger.info(f"Initialized ChromaDB collections: {self.config.collection_name}, "
+                        f"{self.config.email_collection_name}")
             
         except Exception as e:
             logger.error(f"Failed to initialize ChromaDB: {str(e)}")
@@ -147,10 +234,446 @@ class BucketManager:
             logger.error(f"Failed to delete bucket: {str(e)}")
             return False
     
+    def shortlist_buckets(self, email: EmailMessage, buckets: List[Bucket],
+                          top_k: int) -> List[Bucket]:
+        #small bucket sets go to the llm as-is
+        if top_k <= 0 or len(buckets) <= top_k:
+            return buckets
+        
+        try:
+            results = self._collection.query(
+                query_texts=[f"{email.subject}\n{email.snippet}"],
+                n_results=top_k
+            )
+            
+            by_id = {bucket.id: bucket for bucket in buckets}
+            shortlist = [by_id[bucket_id] for bucket_id in results['ids'][0] if bucket_id in by_id]
+            
+            if not shortlist:
+                return buckets
+            
+            logger.debug(f"Shortlisted {len(shortlist)}/{len(buckets)} buckets for '{email.subject}'")
+            return shortlist
+            
+        except Exception as e:
+            logger.error(f"Failed to shortlist buckets: {str(e)}")
+            return buckets
+    
     def get_bucket_count(self) -> int:
         try:
             results = self._collection.get()
             return len(results['ids'])
         except Exception as e:
             logger.error(f"Failed to get bucket count: {str(e)}")
+            return 0
+    
+    @property
+    def embedding_model(self) -> str:
+        #bundles record this so embeddings are only reused under the same model
+        return getattr(self._embedding_function, 'MODEL_NAME', type(self._embedding_function).__name__)
+    
+    def export_bundle(self) -> BucketBundle:
+        try:
+            results = self._collection.get(include=['documents', 'metadatas', 'embeddings'])
+            
+            buckets = []
+            embeddings = []
+            for i, bucket_id in enumerate(results['ids']):
+                buckets.append(Bucket(
+                    id=bucket_id,
+                    title=results['metadatas'][i]['title'],
+                    prompt=results['documents'][i],
+                    created_at=datetime.fromisoformat(results['metadatas'][i]['created_at'])
+                ))
+                embeddings.append(list(results['embeddings'][i]))
+            
+            dimension = len(embeddings[0]) if embeddings else 0
+            logger.info(f"Exported {len(buckets)} buckets ({self.embedding_model}, {dimension} dims)")
+            return BucketBundle(
+                embedding_model=self.embedding_model,
+                dimension=dimension,
+                buckets=buckets,
+                embeddings=embeddings
+            )
+            
+        except Exception as e:
+            logger.error(f"Failed to export buckets: {str(e)}")
+            raise RuntimeError(f"Bucket export failed: {str(e)}")
+    
+    def import_bundle(self, bundle: BucketBundle, replace: bool = False) -> Dict[str, int]:
+        #upserts by id, so importing the same bundle twice is harmless
+        try:
+            #last occurrence wins when the same id shows up twice
+            by_id = {}
+            for bucket, embedding in zip(bundle.buckets, bundle.embeddings or [None] * len(bundle.buckets)):
+                by_id[bucket.id] = (bucket, embedding)
+            ids = list(by_id)
+            documents = [by_id[bucket_id][0].prompt for bucket_id in ids]
+            metadatas = [{
+                'title': by_id[bucket_id][0].title,
+                'created_at': by_id[bucket_id][0].created_at.isoformat()
+            } for bucket_id in ids]
+            
+            reuse = bundle.embedding_model == self.embedding_model and bundle.has_embeddings
+            if reuse:
+                embeddings = [by_id[bucket_id][1] for bucket_id in ids]
+            else:
+                logger.info(f"Re-embedding {len(ids)} bucket prompts "
+                            f"(bundle model '{bundle.embedding_model}', local '{self.embedding_model}')")
+                embeddings = self._embed(documents)
+            
+            batch_size = self._client.max_batch_size
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
+                self._collection.upsert(
+                    ids=ids[start:end],
+                    embeddings=embeddings[start:end],
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end]
+                )
+            
+            #only once the whole bundle is in, so a failed batch leaves the old set intact
+            removed = 0
+            if replace:
+                keep = set(ids)
+                stale = [bucket_id for bucket_id in self._collection.get(include=[])['ids'] if bucket_id not in keep]
+                if stale:
+                    self._collection.delete(ids=stale)
+                removed = len(stale)
+            
+            stats = {
+                'imported': len(ids),
+                'embedded': 0 if reuse else len(ids),
+                'removed': removed
+            }
+            logger.info(f"Imported {stats['imported']} buckets ({stats['embedded']} re-embedded, "
+                        f"{stats['removed']} removed)")
+            return stats
+            
+        except Exception as e:
+            logger.error(f"Failed to import buckets: {str(e)}")
+            raise RuntimeError(f"Bucket import failed: {str(e)}")
+    
+    def export_buckets(self, path: Union[str, Path]) -> int:
+        bundle = self.export_bundle()
+        Path(path).write_bytes(bundle.to_bytes())
+        return len(bundle.buckets)
+    
+    def import_buckets(self, path: Union[str, Path], replace: bool = False) -> Dict[str, int]:
+        try:
+            bundle = BucketBundle.from_bytes(Path(path).read_bytes())
+        except Exception as e:
+            logger.error(f"Failed to read bucket bundle {path}: {str(e)}")
+            raise RuntimeError(f"Bucket import failed: {str(e)}")
+        return self.import_bundle(bundle, replace=replace)
+    
+    @staticmethod
+    def _email_document(cat_email: CategorizedEmail) -> str:
+        email = cat_email.email
+        return "\n".join(filter(None, [email.subject, email.snippet, cat_email.summary]))
+    
+    @staticmethod
+    def _content_hash(document: str) -> str:
+        return hashlib.sha256(document.encode('utf-8')).hexdigest()
+    
+    def _embed(self, documents: List[str]) -> List[List[float]]:
+        #embed in batches, reusing anything already seen by content hash
+        with self._embedding_lock:
+            return self._embed_locked(documents)
+    
+    def _embed_locked(self, documents: List[str]) -> List[List[float]]:
+        hashes = [self._content_hash(doc) for doc in documents]
+        missing = list(dict.fromkeys(
+            (h, doc) for h, doc in zip(hashes, documents) if h not in self._embedding_cache
+        ))
+        
+        batch_size = self.config.embedding_batch_size
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            embeddings = self._embedding_function([doc for _, doc in batch])
+            for (h, _), embedding in zip(batch, embeddings):
+                self._embedding_cache[h] = list(embedding)
+        
+        result = []
+        for h in hashes:
+            self._embedding_cache.move_to_end(h)
+            result.append(self._embedding_cache[h])
+        
+        while len(self._embedding_cache) > self.config.embedding_cache_size:
+            self._embedding_cache.popitem(last=False)
+        
+        return result
+    
+    def _email_metadata(self, cat_email: CategorizedEmail, content_hash: str) -> Dict:
+        email = cat_email.email
+        return {
+            'subject': email.subject,
+            'sender': email.sender,
+            'sender_key': email.sender.lower(),
+            'date': email.date.isoformat(),
+            'date_ts': email.date.timestamp(),
+            'snippet': email.snippet,
+            'summary': cat_email.summary or '',
+            'bucket_id': cat_email.bucket_id,
+            'bucket_title': cat_email.bucket_title,
+            'confidence': float(cat_email.confidence),
+            'content_hash': content_hash
+        }
+    
+    @staticmethod
+    def _categorized_from_index(uid: str, metadata: Dict) -> CategorizedEmail:
+        #the index keeps the snippet, not the full body
+        return CategorizedEmail(
+            email=EmailMessage(
+                uid=uid,
+                subject=metadata['subject'],
+                sender=metadata['sender'],
+                date=datetime.fromisoformat(metadata['date']),
+                body=metadata['snippet'],
+                snippet=metadata['snippet']
+            ),
+            bucket_id=metadata['bucket_id'],
+            bucket_title=metadata['bucket_title'],
+            summary=metadata['summary'] or None,
+            confidence=metadata['confidence']
+        )
+    
+    def index_emails(self, categorized: List[CategorizedEmail]) -> int:
+        if not categorized:
+            return 0
+        
+        try:
+            #last occurrence wins when the same uid shows up twice
+            by_uid = {cat_email.email.uid: cat_email for cat_email in categorized}
+            ids = list(by_uid)
+            documents = [self._email_document(by_uid[uid]) for uid in ids]
+            hashes = [self._content_hash(doc) for doc in documents]
+            metadatas = [self._email_metadata(by_uid[uid], h) for uid, h in zip(ids, hashes)]
+            
+            existing = self._email_collection.get(ids=ids, include=['metadatas', 'embeddings'])
+            stored = dict(zip(existing['ids'], existing['metadatas']))
+            
+            with self._embedding_lock:
+                #unchanged content keeps its stored embedding
+                for metadata, embedding in zip(existing['metadatas'], existing['embeddings']):
+                    if metadata.get('content_hash') and metadata['content_hash'] not in self._embedding_cache:
+                        self._embedding_cache[metadata['content_hash']] = list(embedding)
+                
+                #entries identical to what is stored need no write at all
+                changed = [i for i, uid in enumerate(ids) if stored.get(uid) != metadatas[i]]
+                cached_before = sum(1 for h in {hashes[i] for i in changed} if h in self._embedding_cache)
+                embeddings = self._embed_locked([documents[i] for i in changed])
+            
+            batch_size = self._client.max_batch_size
+            for start in range(0, len(changed), batch_size):
+                batch = changed[start:start + batch_size]
+                self._email_collection.upsert(
+                    ids=[ids[i] for i in batch],
+                    embeddings=embeddings[start:start + batch_size],
+                    documents=[documents[i] for i in batch],
+                    metadatas=[metadatas[i] for i in batch]
+                )
+            
+            with self._filter_index_lock:
+                if self._filter_index_pending is not None:
+                    self._filter_index_pending.extend((ids[i], metadatas[i]) for i in changed)
+                for i in changed:
+                    self._filter_index.put(ids[i], metadatas[i])
+            
+            embedded = len({hashes[i] for i in changed}) - cached_before
+            logger.info(f"Indexed {len(ids)} emails ({len(changed)} changed, {embedded} newly embedded)")
+            return embedded
+            
+        except Exception as e:
+            logger.error(f"Failed to index emails: {str(e)}")
+            return 0
+    
+    def _load_filter_index(self):
+        with self._filter_index_lock:
+            self._filter_index_pending = []
+        try:
+            #one pass; offset paging is far slower in chroma's sqlite segment
+            results = self._email_collection.get(include=['metadatas'])
+            index = _EmailFilterIndex()
+            for uid, metadata in zip(results['ids'], results['metadatas']):
+                index.put(uid, metadata)
+            
+            #the snapshot can predate writes that landed while it was read
+            with self._filter_index_lock:
+                for uid, metadata in self._filter_index_pending:
+                    index.put(uid, metadata)
+                self._filter_index_pending = None
+                index.loaded = True
+                self._filter_index = index
+            logger.info(f"Loaded search filter index for {len(index)} emails")
+            
+        except Exception as e:
+            logger.error(f"Failed to load search filter index: {str(e)}")
+            #filtered searches use chroma's where filter until a retry succeeds
+            with self._filter_index_lock:
+                self._filter_index_pending = None
+                self._filter_index_thread = None
+                self._filter_index_retry_at = time.monotonic() + FILTER_INDEX_RETRY_SECONDS
+    
+    def _ensure_filter_index(self) -> bool:
+        if self._filter_index.loaded:
+            return True
+        with self._filter_index_lock:
+            if self._filter_index_thread is None and time.monotonic() >= self._filter_index_retry_at:
+                self._filter_index_thread = threading.Thread(
+                    target=self._load_filter_index,
+                    name="email-filter-index",
+                    daemon=True
+                )
+                self._filter_index_thread.start()
+        return False
+    
+    def warm_search_index(self):
+        if not self._ensure_filter_index():
+            thread = self._filter_index_thread
+            if thread is not None:
+                thread.join()
+    
+    def _nearest_allowed(self, query_embedding: List[float], allowed: set,
+                         n_results: int) -> List[tuple]:
+        #small candidate sets are cheaper to score directly
+        if len(allowed) <= BRUTE_FORCE_LIMIT:
+            results = self._email_collection.get(ids=list(allowed), include=['embeddings'])
+            scored = [
+                (sum((a - b) ** 2 for a, b in zip(query_embedding, embedding)), uid)
+                for uid, embedding in zip(results['ids'], results['embeddings'])
+            ]
+            return [(uid, distance) for distance, uid in sorted(scored)[:n_results]]
+        
+        #otherwise over-fetch from the unfiltered ann index, sized by selectivity
+        total = max(1, len(self._filter_index))
+        k = min(total, max(n_results, int(n_results * total / len(allowed) * OVERFETCH_FACTOR)))
+        while True:
+            results = self._email_collection.query(
+                query_embeddings=[query_embedding],
+                n_results=k,
+                include=['distances']
+            )
+            hits = [
+                (uid, distance)
+                for uid, distance in zip(results['ids'][0], results['distances'][0])
+                if uid in allowed
+            ]
+            if len(hits) >= n_results or k >= min(total, MAX_OVERFETCH):
+                return hits[:n_results]
+            k = min(total, MAX_OVERFETCH, k * 2)
+    
+    def search_emails(self, query: str, n_results: int = 10,
+                      bucket_id: Optional[str] = None,
+                      sender: Optional[str] = None,
+                      date_from: Optional[datetime] = None,
+                      date_to: Optional[datetime] = None) -> List[EmailSearchResult]:
+        sender_key = sender.lower() if sender else None
+        ts_from = date_from.timestamp() if date_from else None
+        ts_to = date_to.timestamp() if date_to else None
+        filtered = any(v is not None for v in (bucket_id, sender_key, ts_from, ts_to))
+        
+        try:
+            query_embedding = self._embed([query])[0]
+            
+            if not filtered or not self._ensure_filter_index():
+                return self._search_with_where(query_embedding, n_results, bucket_id,
+                                               sender_key, ts_from, ts_to)
+            
+            allowed = self._filter_index.match(bucket_id, sender_key, ts_from, ts_to)
+            if not allowed:
+                return []
+            
+            hits = self._nearest_allowed(query_embedding, allowed, n_results)
+            if len(hits) < min(n_results, len(allowed)):
+                #very selective filter the ann over-fetch could not satisfy
+                return self._search_with_where(query_embedding, n_results, bucket_id,
+                                               sender_key, ts_from, ts_to)
+            
+            results = self._email_collection.get(ids=[uid for uid, _ in hits], include=['metadatas'])
+            metadata_by_id = dict(zip(results['ids'], results['metadatas']))
+            
+            return [
+                EmailSearchResult(
+                    categorized=self._categorized_from_index(uid, metadata_by_id[uid]),
+                    distance=distance
+                )
+                for uid, distance in hits if uid in metadata_by_id
+            ]
+            
+        except Exception as e:
+            logger.error(f"Email search failed: {str(e)}")
+            return []
+    
+    def _search_with_where(self, query_embedding: List[float], n_results: int,
+                           bucket_id: Optional[str], sender_key: Optional[str],
+                           ts_from: Optional[float], ts_to: Optional[float]) -> List[EmailSearchResult]:
+        conditions = []
+        if bucket_id:
+            conditions.append({'bucket_id': bucket_id})
+        if sender_key:
+            conditions.append({'sender_key': sender_key})
+        if ts_from is not None:
+            conditions.append({'date_ts': {'$gte': ts_from}})
+        if ts_to is not None:
+            conditions.append({'date_ts': {'$lte': ts_to}})
+        
+        where = None
+        if len(conditions) == 1:
+            where = conditions[0]
+        elif conditions:
+            where = {'$and': conditions}
+        
+        results = self._email_collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=where,
+            include=['metadatas', 'distances']
+        )
+        
+        return [
+            EmailSearchResult(
+                categorized=self._categorized_from_index(uid, metadata),
+                distance=distance
+            )
+            for uid, metadata, distance in zip(
+                results['ids'][0], results['metadatas'][0], results['distances'][0]
+            )
+        ]
+    
+    def find_affected_emails(self, bucket_id: str, change: BucketChange) -> List[CategorizedEmail]:
+        #emails whose decision could change after a bucket was created, updated or deleted
+        affected: Dict[str, CategorizedEmail] = {}
+        
+        try:
+            if change != BucketChange.CREATED:
+                #current members of an edited or deleted bucket
+                members = self._email_collection.get(where={'bucket_id': bucket_id}, include=['metadatas'])
+                for uid, metadata in zip(members['ids'], members['metadatas']):
+                    affected[uid] = self._categorized_from_index(uid, metadata)
+            
+            if change != BucketChange.DELETED:
+                #plus the emails nearest to the bucket prompt
+                bucket = self._collection.get(ids=[bucket_id], include=['embeddings'])
+                total = self._email_collection.count()
+                if bucket['ids'] and total:
+                    neighbors = self._email_collection.query(
+                        query_embeddings=bucket['embeddings'],
+                        n_results=min(total, self.config.recategorize_neighbors),
+                        include=['metadatas']
+                    )
+                    for uid, metadata in zip(neighbors['ids'][0], neighbors['metadatas'][0]):
+                        affected.setdefault(uid, self._categorized_from_index(uid, metadata))
+            
+            return list(affected.values())
+            
+        except Exception as e:
+            logger.error(f"Failed to find emails affected by bucket {bucket_id}: {str(e)}")
+            return list(affected.values())
+    
+    def get_indexed_email_count(self) -> int:
+        try:
+            return self._email_collection.count()
+        except Exception as e:
+            logger.error(f"Failed to get indexed email count: {str(e)}")
             return 0
\ No newline at end of file
@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import http.client
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from models import EmailMessage, Bucket, CategorizedEmail
+from config import OllamaConfig, ServiceConfig
+from categorizer import EmailCategorizer, DEFERRED_TIER, deferred_result
+from ollama_pool import Deadline
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+
+
+class ServiceUnavailableError(ConnectionError):
+    pass
+
+
+class CategorizationService:
+    #one per machine: owns the ollama pool, worker threads and result cache,
+    #so concurrent streamlit sessions share work instead of duplicating it
+
+    def __init__(self, ollama_config: OllamaConfig, config: ServiceConfig):
+        self.config = config
+        self.categorizer = EmailCategorizer(ollama_config)
+        self._executor = ThreadPoolExecutor(max_workers=config.workers, thread_name_prefix="service")
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._stats = {'requests': 0, 'cache_hits': 0, 'deduplicated': 0, 'executed': 0, 'summaries': 0}
+        self._ollama_state = STARTING
+        self._ollama_detail = "Connecting..."
+        self._server = None
+        self.port = config.port
+
+    def close(self):
+        #frees the pool's health-check thread and every executor
+        self.categorizer.close()
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def _request_key(payload: dict) -> str:
+        #everything that can change the answer, and nothing that can't
+        email = payload['email']
+        buckets = [(b['id'], b['title'], b['prompt']) for b in payload['buckets']]
+        material = json.dumps([email['subject'], email['sender'], email['snippet'], buckets])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _categorize_sync(self, payload: dict) -> dict:
+        email = EmailMessage.from_dict(payload['email'])
+        buckets = [Bucket.from_dict(b) for b in payload['buckets']]
+        #the caller's remaining fetch budget, if it has one
+        deadline = Deadline(payload['timeout']) if payload.get('timeout') is not None else None
+        return self.categorizer.categorize_email(email, buckets, deadline).to_dict()
+
+    async def _shared(self, key: str, fn, payload: dict) -> dict:
+        #identical requests already running wait on the same future
+        future = self._in_flight.get(key)
+        if future is not None:
+            self._stats['deduplicated'] += 1
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, fn, payload)
+        self._in_flight[key] = future
+        self._stats['executed'] += 1
+        try:
+            return await future
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def categorize(self, payload: dict) -> dict:
+        self._stats['requests'] += 1
+        key = self._request_key(payload)
+
+        if key in self._cache:
+            self._stats['cache_hits'] += 1
+            self._cache.move_to_end(key)
+            return self._with_email(self._cache[key], payload)
+
+        result = await self._shared(key, self._categorize_sync, payload)
+
+        #failed calls and unparseable replies are not cached so the next request retries
+        if result.get('model_tier') != DEFERRED_TIER:
+            self._cache[key] = result
+            while len(self._cache) > self.config.cache_size:
+                self._cache.popitem(last=False)
+
+        return self._with_email(result, payload)
+
+    def _summarize_sync(self, payload: dict) -> dict:
+        email = EmailMessage.from_dict(payload['email'])
+        return {'summary': self.categorizer.summarize_email(email)}
+
+    async def summarize(self, payload: dict) -> dict:
+        #the summarizer keeps its own content-hash cache
+        self._stats['summaries'] += 1
+        email = EmailMessage.from_dict(payload['email'])
+        key = f"summary:{self.categorizer.summarizer.content_key(email)}"
+        return await self._shared(key, self._summarize_sync, payload)
+
+    @staticmethod
+    def _with_email(result: dict, payload: dict) -> dict:
+        #shared results carry the requester's own copy of the email
+        return dict(result, email=payload['email'])
+
+    def health(self) -> dict:
+        return {
+            'ollama': {'state': self._ollama_state, 'detail': self._ollama_detail},
+            'hosts': self.categorizer.pool.get_stats(),
+            'escalation': self.categorizer.escalation_stats.to_dict(),
+            'calls': self.categorizer.pool.get_call_stats(),
+            'service': dict(self._stats, in_flight=len(self._in_flight), cached=len(self._cache))
+        }
+
+    def _validate(self):
+        try:
+            self.categorizer.validate()
+            self._ollama_detail = f"Loading {self.categorizer.config.model}..."
+            self.categorizer.warm_up()
+            self._ollama_state = READY
+            self._ollama_detail = self.categorizer.config.model
+        except Exception as e:
+            logger.error(f"Ollama startup failed: {str(e)}")
+            self._ollama_state = FAILED
+            self._ollama_detail = str(e)
+
+    def revalidate(self) -> bool:
+        #re-run the startup checks after ollama failed them
+        if self._ollama_state != FAILED:
+            return False
+        self._ollama_state = STARTING
+        self._ollama_detail = "Retrying..."
+        self._executor.submit(self._validate)
+        return True
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        if method == 'GET' and path == '/health':
+            return 200, self.health()
+        if method == 'POST' and path == '/revalidate':
+            return 200, {'restarted': self.revalidate()}
+        if method == 'POST' and path in ('/categorize', '/summarize'):
+            try:
+                payload = json.loads(body)
+            except ValueError as e:
+                return 400, {'error': f"Invalid JSON: {str(e)}"}
+            if not isinstance(payload, dict) or 'email' not in payload:
+                return 400, {'error': "Request needs 'email'"}
+            if path == '/summarize':
+                return 200, await self.summarize(payload)
+            if 'buckets' not in payload:
+                return 400, {'error': "Request needs 'email' and 'buckets'"}
+            return 200, await self.categorize(payload)
+        return 404, {'error': f"No route for {method} {path}"}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, value = line.decode('latin-1').split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            status, payload = await self._route(method, path, body)
+
+        except Exception as e:
+            logger.error(f"Service request failed: {str(e)}")
+            status, payload = 500, {'error': str(e)}
+
+        data = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, started: Optional[threading.Event] = None):
+        self._server = await asyncio.start_server(self._handle, self.config.host, self.config.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Categorization service listening on {self.config.host}:{self.port}")
+        if started:
+            started.set()
+
+        asyncio.get_running_loop().run_in_executor(self._executor, self._validate)
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self, timeout: float = 10.0) -> 'CategorizationService':
+        started = threading.Event()
+        errors: List[Exception] = []
+
+        def run():
+            try:
+                asyncio.run(self.serve(started))
+            except Exception as e:
+                errors.append(e)
+                started.set()
+
+        threading.Thread(target=run, name="categorization-service", daemon=True).start()
+        if not started.wait(timeout):
+            raise RuntimeError(f"Categorization service did not start within {timeout:g}s")
+        if errors:
+            raise errors[0]
+        return self
+
+
+class CategorizationClient:
+    #drop-in for EmailCategorizer.categorize_email, backed by the shared service
+
+    def __init__(self, config: ServiceConfig):
+        self.config = config
+
+    def _request(self, method: str, path: str, payload: Optional[dict] = None,
+                 timeout: Optional[float] = None) -> dict:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        connection = http.client.HTTPConnection(
+            self.config.host, self.config.port, timeout=timeout or self.config.request_timeout
+        )
+        try:
+            connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            data = json.loads(response.read() or b'{}')
+        except (ConnectionError, OSError) as e:
+            raise ServiceUnavailableError(f"Categorization service unreachable: {str(e)}")
+        finally:
+            connection.close()
+
+        if response.status != 200:
+            raise RuntimeError(f"Categorization service error: {data.get('error')}")
+        return data
+
+    def ping(self) -> bool:
+        try:
+            self._request('GET', '/health', timeout=2.0)
+            return True
+        except Exception:
+            return False
+
+    def health(self) -> dict:
+        return self._request('GET', '/health', timeout=5.0)
+
+    def revalidate(self) -> bool:
+        return self._request('POST', '/revalidate', {}, timeout=5.0)['restarted']
+
+    def categorize_email(self, email: EmailMessage, buckets: List[Bucket],
+                         deadline: Optional[Deadline] = None) -> CategorizedEmail:
+        payload = {
+            'email': email.to_dict(),
+            'buckets': [bucket.to_dict() for bucket in buckets]
+        }
+        timeout = None
+        if deadline is not None:
+            payload['timeout'] = deadline.remaining()
+            #a little slack so the service answers before we hang up
+            timeout = min(self.config.request_timeout, payload['timeout'] + 5.0)
+
+        try:
+            result = self._request('POST', '/categorize', payload, timeout=timeout)
+            return CategorizedEmail.from_dict(dict(result, email=email.to_dict()))
+
+        except Exception as e:
+            logger.error(f"Categorization error for email '{email.subject}': {str(e)}")
+            #uncategorized for now, retried later
+            return deferred_result(email)
+
+    def summarize_email(self, email: EmailMessage) -> Optional[str]:
+        try:
+            return self._request('POST', '/summarize', {'email': email.to_dict()})['summary']
+        except Exception as e:
+            logger.error(f"Summary error for email '{email.subject}': {str(e)}")
+            return None
+
+
+def connect_or_start(ollama_config: OllamaConfig, config: ServiceConfig) -> CategorizationClient:
+    #reuse a running service, otherwise host one in this process
+    client = CategorizationClient(config)
+    if client.ping():
+        logger.info(f"Using categorization service at {config.url}")
+        return client
+
+    service = CategorizationService(ollama_config, config)
+    try:
+        service.start_in_thread()
+    except OSError as e:
+        #another process won the race for the port
+        logger.info(f"Categorization service already starting elsewhere: {str(e)}")
+        service.close()
+    return client
+
+
+if __name__ == "__main__":
+    from config import load_ollama_config, load_service_config, load_profiling_config
+    from profiling import profile_run
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    service = CategorizationService(load_ollama_config(), load_service_config())
+    #with AUTOKITE_PROFILE set the report is written when the service stops
+    with profile_run('service', load_profiling_config()):
+        try:
+            asyncio.run(service.serve())
+        except KeyboardInterrupt:
+            logger.info("Categorization service stopped")
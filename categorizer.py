@@ -1,39 +1,128 @@
 import logging
 import json
-from typing import List, Dict
-import ollama
+import threading
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional
 
 from models import EmailMessage, Bucket, CategorizedEmail
 from config import OllamaConfig
+from ollama_pool import OllamaHostPool, Deadline
+from summarizer import LongEmailSummarizer
 
 logger = logging.getLogger(__name__)
 
+PRIMARY_TIER = "primary"
+ESCALATED_TIER = "escalated"
+#no model answered in time, the scheduler retries these later
+DEFERRED_TIER = "deferred"
+
+
+def deferred_result(email: EmailMessage) -> CategorizedEmail:
+    return CategorizedEmail(
+        email=email,
+        bucket_id="uncategorized",
+        bucket_title="Uncategorized",
+        summary=None,
+        confidence=0.0,
+        model_tier=DEFERRED_TIER
+    )
+
+
+@dataclass
+class EscalationStats:
+    total: int = 0
+    escalated: int = 0
+    low_confidence: int = 0
+    parse_failures: int = 0
+    kept_primary: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    
+    def record(self, reason: Optional[str]):
+        with self._lock:
+            self.total += 1
+            if reason is None:
+                return
+            self.escalated += 1
+            if reason == 'parse_failure':
+                self.parse_failures += 1
+            else:
+                self.low_confidence += 1
+    
+    def record_kept_primary(self):
+        #the larger model did no better, the primary result stands
+        with self._lock:
+            self.kept_primary += 1
+    
+    @property
+    def escalation_rate(self) -> float:
+        return self.escalated / self.total if self.total else 0.0
+    
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'total': self.total,
+                'escalated': self.escalated,
+                'low_confidence': self.low_confidence,
+                'parse_failures': self.parse_failures,
+                'kept_primary': self.kept_primary,
+                'escalation_rate': self.escalation_rate
+            }
+
 
 class EmailCategorizer:
     
     def __init__(self, config: OllamaConfig):
         self.config = config
-        self._validate_ollama()
+        self.pool = OllamaHostPool(
+            config.hosts,
+            health_check_interval=config.health_check_interval,
+            max_failures=config.max_host_failures,
+            max_retries=config.max_retries,
+            request_timeout=config.request_timeout,
+            retry_backoff=config.retry_backoff,
+            retry_backoff_max=config.retry_backoff_max,
+            hedge_quantile=config.hedge_quantile,
+            hedge_min_samples=config.hedge_min_samples,
+            breaker_threshold=config.breaker_threshold,
+            breaker_cooldown=config.breaker_cooldown,
+            max_abandoned=config.max_abandoned_calls
+        )
+        self.escalation_stats = EscalationStats()
+        self.summarizer = LongEmailSummarizer(self.pool, config)
     
-    def _validate_ollama(self):
+    def close(self):
+        self.summarizer.close()
+        self.pool.close()
+    
+    def validate(self):
         try:
             #check ollama access
-            models = ollama.list()
-            logger.info(f"Connected to Ollama at {self.config.host}")
+            models = self.pool.list()
+            logger.info(f"Connected to Ollama at {', '.join(self.pool.hosts)}")
             
             #check model availability
             model_names = [m['name'] for m in models.get('models', [])]
-            if not any(self.config.model in name for name in model_names):
-                logger.warning(f"Model {self.config.model} not found. Available: {model_names}")
-                logger.info(f"Run: ollama pull {self.config.model}")
+            for model in filter(None, [self.config.model, self.config.escalation_model]):
+                if not any(model in name for name in model_names):
+                    logger.warning(f"Model {model} not found. Available: {model_names}")
+                    logger.info(f"Run: ollama pull {model}")
                 
         except Exception as e:
             logger.error(f"Ollama validation failed: {str(e)}")
             raise RuntimeError(
-                f"Cannot connect to Ollama. Ensure it's running at {self.config.host} "
+                f"Cannot connect to Ollama. Ensure it's running at {', '.join(self.config.hosts)} "
                 f"and model '{self.config.model}' is pulled."
             )
     
+    def warm_up(self):
+        #load the model weights now so the first real email doesn't pay for it
+        self.pool.chat(
+            model=self.config.model,
+            messages=[{'role': 'user', 'content': 'ok'}],
+            options={'num_predict': 1}
+        )
+        logger.info(f"Warmed up {self.config.model}")
+    
     def _build_categorization_prompt(self, email: EmailMessage, buckets: List[Bucket]) -> str:
         bucket_descriptions = "\n".join([
             f"{i+1}. {bucket.title}: {bucket.prompt}"
@@ -98,40 +187,84 @@ Response:"""
             logger.error(f"Response parsing error: {str(e)}")
             return {'bucket_number': buckets_len + 1, 'confidence': 0.0, 'reason': 'Unknown error'}
     
-    def categorize_email(self, email: EmailMessage, buckets: List[Bucket]) -> CategorizedEmail:
+    def _run_model(self, email: EmailMessage, buckets: List[Bucket], model: str,
+                   deadline: Optional[Deadline] = None) -> Dict:
+        prompt = self._build_categorization_prompt(email, buckets)
+        
+        #llm call
+        response = self.pool.chat(
+            deadline=deadline,
+            model=model,
+            messages=[{
+                'role': 'user',
+                'content': prompt
+            }],
+            options={
+                'temperature': self.config.temperature,
+            }
+        )
+
+        logger.debug(response)
+        
+        #parse
+        llm_output = response['message']['content']
+        return self._parse_llm_response(llm_output, len(buckets))
+    
+    def _escalation_reason(self, parsed: Dict) -> Optional[str]:
+        #parse failures come back with a 'reason' and no summary
+        if 'reason' in parsed or 'summary' not in parsed:
+            return 'parse_failure'
+        if parsed['confidence'] < self.config.escalation_threshold:
+            return 'low_confidence'
+        return None
+    
+    def categorize_email(self, email: EmailMessage, buckets: List[Bucket],
+                         deadline: Optional[Deadline] = None) -> CategorizedEmail:
         if not buckets:
             #if no buckets available, mark as uncategorized
             return CategorizedEmail(
                 email=email,
                 bucket_id="uncategorized",
                 bucket_title="Uncategorized",
+                summary=None,
                 confidence=1.0
             )
         
         try:
-            prompt = self._build_categorization_prompt(email, buckets)
-            
-            #llm call
-            response = ollama.chat(
-                model=self.config.model,
-                messages=[{
-                    'role': 'user',
-                    'content': prompt
-                }],
-                options={
-                    'temperature': self.config.temperature,
-                }
-            )
-
-            print(response)
+            model = self.config.model
+            model_tier = PRIMARY_TIER
+            parsed = self._run_model(email, buckets, model, deadline)
             
-            #parse
-            llm_output = response['message']['content']
-            parsed = self._parse_llm_response(llm_output, len(buckets))
+            #re-run doubtful results on the larger model
+            if self.config.escalation_model:
+                reason = self._escalation_reason(parsed)
+                self.escalation_stats.record(reason)
+                
+                if reason:
+                    try:
+                        escalated = self._run_model(email, buckets, self.config.escalation_model, deadline)
+                        if self._escalation_reason(escalated) == 'parse_failure' or \
+                                escalated['confidence'] < parsed['confidence']:
+                            self.escalation_stats.record_kept_primary()
+                            logger.debug(f"Escalation for '{email.subject}' did no better, "
+                                         f"keeping {PRIMARY_TIER} result")
+                        else:
+                            parsed = escalated
+                            model = self.config.escalation_model
+                            model_tier = ESCALATED_TIER
+                    except Exception as e:
+                        logger.warning(f"Escalation failed for '{email.subject}', "
+                                       f"keeping {PRIMARY_TIER} result: {str(e)}")
+            
+            #neither tier gave a usable answer; deferred, so it is retried
+            #rather than cached or indexed as a real decision
+            if self._escalation_reason(parsed) == 'parse_failure':
+                logger.warning(f"Unparseable reply for '{email.subject}', deferring")
+                return deferred_result(email)
             
             bucket_number = parsed['bucket_number']
             
-            if bucket_number <= len(buckets):
+            if 1 <= bucket_number <= len(buckets):
                 selected_bucket = buckets[bucket_number - 1]
                 bucket_id = selected_bucket.id
                 bucket_title = selected_bucket.title
@@ -139,26 +272,31 @@ Response:"""
                 bucket_id = "uncategorized"
                 bucket_title = "Uncategorized"
             
-            logger.debug(f"Categorized '{email.subject}' -> {bucket_title} (confidence: {parsed['confidence']:.2f})")
+            logger.debug(f"Categorized '{email.subject}' -> {bucket_title} "
+                         f"(confidence: {parsed['confidence']:.2f}, tier: {model_tier})")
             
             return CategorizedEmail(
                 email=email,
                 bucket_id=bucket_id,
                 bucket_title=bucket_title,
-                summary=parsed['summary'],
-                confidence=parsed['confidence']
+                summary=parsed.get('summary'),
+                confidence=parsed['confidence'],
+                model_tier=model_tier,
+                model=model
             )
             
         except Exception as e:
             logger.error(f"Categorization error for email '{email.subject}': {str(e)}")
-            #uncategorized fallback
-            return CategorizedEmail(
-                email=email,
-                bucket_id="uncategorized",
-                bucket_title="Uncategorized",
-                summary=None,
-                confidence=0.0
-            )
+            #uncategorized for now, retried later
+            return deferred_result(email)
+    
+    def summarize_email(self, email: EmailMessage) -> Optional[str]:
+        #full-body summary on demand, the categorization summary only sees the snippet
+        try:
+            return self.summarizer.summarize(email)
+        except Exception as e:
+            logger.error(f"Summary error for email '{email.subject}': {str(e)}")
+            return None
     
     # def categorize_batch(self, emails: List[EmailMessage], 
     #                     buckets: List[Bucket]) -> List[CategorizedEmail]:
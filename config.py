@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field, validator
 
@@ -29,7 +29,32 @@ class EmailConfig(BaseModel):
 class OllamaConfig(BaseModel):
     model: str = Field(default='phi3.5', env='OLLAMA_MODEL')
     host: str = Field(default='http://localhost:11434', env='OLLAMA_HOST')
+    hosts: List[str] = Field(default_factory=list, env='OLLAMA_HOSTS')
     temperature: float = Field(default=0.1)  
+    escalation_model: Optional[str] = Field(default=None, env='OLLAMA_ESCALATION_MODEL')
+    escalation_threshold: float = Field(default=0.6)
+    health_check_interval: float = Field(default=15.0)
+    max_host_failures: int = Field(default=3)
+    max_retries: int = Field(default=2)
+    workers: int = Field(default=2)
+    request_timeout: float = Field(default=60.0, env='OLLAMA_REQUEST_TIMEOUT')
+    fetch_deadline: float = Field(default=180.0, env='OLLAMA_FETCH_DEADLINE')
+    retry_backoff: float = Field(default=0.25)
+    retry_backoff_max: float = Field(default=2.0)
+    hedge_quantile: float = Field(default=0.95)
+    hedge_min_samples: int = Field(default=20)
+    breaker_threshold: int = Field(default=5)
+    breaker_cooldown: float = Field(default=30.0)
+    max_abandoned_calls: int = Field(default=4)
+    summary_chunk_tokens: int = Field(default=1500, env='OLLAMA_SUMMARY_CHUNK_TOKENS')
+    summary_workers: int = Field(default=4)
+    summary_cache_size: int = Field(default=500)
+    
+    @validator('hosts', always=True)
+    def default_hosts(cls, v, values):
+        #single host setups keep working through OLLAMA_HOST
+        hosts = [h.strip() for h in v if h and h.strip()]
+        return hosts or [values.get('host', 'http://localhost:11434')]
     
     
 class ChromaConfig(BaseModel):
@@ -38,6 +63,11 @@ class ChromaConfig(BaseModel):
         env='CHROMA_PERSIST_DIRECTORY'
     )
     collection_name: str = Field(default='email_buckets')
+    shortlist_size: int = Field(default=8, env='BUCKET_SHORTLIST_SIZE')
+    email_collection_name: str = Field(default='email_index')
+    embedding_batch_size: int = Field(default=64)
+    embedding_cache_size: int = Field(default=10000)
+    recategorize_neighbors: int = Field(default=200)
     
     @validator('persist_directory')
     def create_directory(cls, v):
@@ -45,15 +75,82 @@ class ChromaConfig(BaseModel):
         return v
 
 
+class ServiceConfig(BaseModel):
+    host: str = Field(default='127.0.0.1', env='AUTOKITE_SERVICE_HOST')
+    port: int = Field(default=8765, env='AUTOKITE_SERVICE_PORT')
+    workers: int = Field(default=4)
+    cache_size: int = Field(default=5000)
+    request_timeout: float = Field(default=300.0)
+    
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+
+class HistoryConfig(BaseModel):
+    enabled: bool = Field(default=True, env='AUTOKITE_HISTORY')
+    directory: Path = Field(default=Path('./history'), env='AUTOKITE_HISTORY_DIR')
+    segment_bytes: int = Field(default=256 * 1024 * 1024)
+    #skip the llm for fetched emails already categorized into a live bucket
+    reuse_results: bool = Field(default=True)
+
+
+class ProfilingConfig(BaseModel):
+    enabled: bool = Field(default=False, env='AUTOKITE_PROFILE')
+    output_dir: Path = Field(default=Path('./profiles'), env='AUTOKITE_PROFILE_DIR')
+    trace_memory: bool = Field(default=True, env='AUTOKITE_PROFILE_MEMORY')
+    sample_interval: float = Field(default=0.005)
+    #deep enough to reach our code from inside bs4, tracing cost grows with it
+    traceback_frames: int = Field(default=12)
+    top_n: int = Field(default=25)
+
+
 class AppConfig(BaseModel):
     email: EmailConfig
     ollama: OllamaConfig
     chroma: ChromaConfig
+    service: ServiceConfig = Field(default_factory=ServiceConfig)
+    profiling: ProfilingConfig = Field(default_factory=ProfilingConfig)
+    history: HistoryConfig = Field(default_factory=HistoryConfig)
     
     class Config:
         arbitrary_types_allowed = True
 
 
+def load_ollama_config() -> OllamaConfig:
+    return OllamaConfig(
+        model=os.getenv('OLLAMA_MODEL', 'phi3.5'),
+        host=os.getenv('OLLAMA_HOST', 'http://localhost:11434'),
+        hosts=os.getenv('OLLAMA_HOSTS', '').split(','),
+        escalation_model=os.getenv('OLLAMA_ESCALATION_MODEL') or None,
+        request_timeout=float(os.getenv('OLLAMA_REQUEST_TIMEOUT', '60')),
+        fetch_deadline=float(os.getenv('OLLAMA_FETCH_DEADLINE', '180')),
+        summary_chunk_tokens=int(os.getenv('OLLAMA_SUMMARY_CHUNK_TOKENS', '1500'))
+    )
+
+
+def load_service_config() -> ServiceConfig:
+    return ServiceConfig(
+        host=os.getenv('AUTOKITE_SERVICE_HOST', '127.0.0.1'),
+        port=int(os.getenv('AUTOKITE_SERVICE_PORT', '8765'))
+    )
+
+
+def load_profiling_config() -> ProfilingConfig:
+    return ProfilingConfig(
+        enabled=os.getenv('AUTOKITE_PROFILE', '').lower() in ('1', 'true', 'yes'),
+        trace_memory=os.getenv('AUTOKITE_PROFILE_MEMORY', '1').lower() in ('1', 'true', 'yes'),
+        output_dir=Path(os.getenv('AUTOKITE_PROFILE_DIR', './profiles'))
+    )
+
+
+def load_history_config() -> HistoryConfig:
+    return HistoryConfig(
+        enabled=os.getenv('AUTOKITE_HISTORY', '1').lower() in ('1', 'true', 'yes'),
+        directory=Path(os.getenv('AUTOKITE_HISTORY_DIR', './history'))
+    )
+
+
 def load_config() -> AppConfig:
     try:
         return AppConfig(
@@ -61,12 +158,13 @@ def load_config() -> AppConfig:
                 email=os.getenv('GMAIL_EMAIL', ''),
                 password=os.getenv('GMAIL_APP_PASSWORD', '')
             ),
-            ollama=OllamaConfig(
-                model=os.getenv('OLLAMA_MODEL', 'phi3.5'),
-                host=os.getenv('OLLAMA_HOST', 'http://localhost:11434')
-            ),
+            ollama=load_ollama_config(),
+            service=load_service_config(),
+            profiling=load_profiling_config(),
+            history=load_history_config(),
             chroma=ChromaConfig(
-                persist_directory=Path(os.getenv('CHROMA_PERSIST_DIRECTORY', './chroma_db'))
+                persist_directory=Path(os.getenv('CHROMA_PERSIST_DIRECTORY', './chroma_db')),
+                shortlist_size=int(os.getenv('BUCKET_SHORTLIST_SIZE', '8'))
             )
         )
     except Exception as e:
@@ -1,8 +1,6 @@
 import logging
 from typing import List
 from datetime import datetime
-from imap_tools import MailBox, AND
-from bs4 import BeautifulSoup
 
 from models import EmailMessage
 from config import EmailConfig
@@ -24,6 +22,8 @@ class EmailClient:
         self.disconnect()
     
     def connect(self):
+        from imap_tools import MailBox
+        
         try:
             self._mailbox = MailBox(self.config.imap_server)
             self._mailbox.login(self.config.email, self.config.password)
@@ -45,6 +45,8 @@ class EmailClient:
         if not html_content:
             return ""
         
+        from bs4 import BeautifulSoup
+        
         soup = BeautifulSoup(html_content, 'html.parser')
         
         for script in soup(["script", "style"]):
@@ -62,6 +64,8 @@ class EmailClient:
         if not self._mailbox:
             raise RuntimeError("Not connected to email server")
         
+        from imap_tools import AND
+        
         emails = []
         
         try:
@@ -103,6 +107,8 @@ class EmailClient:
         if not self._mailbox:
             raise RuntimeError("Not connected to email server")
         
+        from imap_tools import AND
+        
         try:
             messages = self._mailbox.fetch(
                 criteria=AND(seen=False),
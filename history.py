@@ -0,0 +1,448 @@
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from models import CategorizedEmail, EmailMessage
+from config import HistoryConfig
+
+try:
+    import fcntl
+except ImportError:
+    #no advisory locks on windows, appends are single writes anyway
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+#magic | rows | body bytes | crc32 of body
+_BLOCK = struct.Struct('<4sIII')
+_MAGIC = b'AKH1'
+_PART = struct.Struct('<I')
+_SEP = '\x00'
+
+#fixed-width columns are arrays ('d', 'f'), 'dict' columns store each distinct
+#value once per block plus a code per row, 'str' columns are NUL-joined text
+SCHEMA = (
+    ('recorded_at', 'd'),
+    ('email_date', 'd'),
+    ('confidence', 'f'),
+    ('latency', 'f'),
+    ('bucket_id', 'dict'),
+    ('bucket_title', 'dict'),
+    ('model', 'dict'),
+    ('model_tier', 'dict'),
+    ('source', 'dict'),
+    ('sender', 'dict'),
+    ('uid', 'str'),
+    ('subject', 'str'),
+    ('summary', 'str'),
+)
+_KINDS = dict(SCHEMA)
+_SWAP = sys.byteorder != 'little'
+
+
+def _array_bytes(kind: str, values) -> bytes:
+    data = values if isinstance(values, array) else array(kind, values)
+    if _SWAP:
+        data = array(kind, data)
+        data.byteswap()
+    return data.tobytes()
+
+
+def _read_array(kind: str, raw) -> array:
+    data = array(kind)
+    data.frombytes(raw)
+    if _SWAP:
+        data.byteswap()
+    return data
+
+
+def _join(values) -> bytes:
+    return _SEP.join(v.replace(_SEP, '') for v in values).encode('utf-8')
+
+
+def _split(raw) -> List[str]:
+    return bytes(raw).decode('utf-8').split(_SEP)
+
+
+def encode_block(rows: Sequence[tuple]) -> bytes:
+    #rows follow SCHEMA order
+    parts = []
+    for (name, kind), values in zip(SCHEMA, zip(*rows)):
+        if kind == 'dict':
+            index: Dict[str, int] = {}
+            codes = array('I', [index.setdefault(v, len(index)) for v in values])
+            parts.append(_join(index))
+            parts.append(_array_bytes('I', codes))
+        elif kind == 'str':
+            parts.append(_join(values))
+        else:
+            parts.append(_array_bytes(kind, values))
+
+    body = b''.join(_PART.pack(len(part)) + part for part in parts)
+    return _BLOCK.pack(_MAGIC, len(rows), len(body), zlib.crc32(body)) + body
+
+
+def _split_parts(body: bytes) -> List[memoryview]:
+    view = memoryview(body)
+    parts = []
+    offset = 0
+    while offset < len(view):
+        (length,) = _PART.unpack_from(view, offset)
+        offset += _PART.size
+        parts.append(view[offset:offset + length])
+        offset += length
+    return parts
+
+
+def read_blocks(path: Path) -> Iterator[Tuple[int, List[memoryview]]]:
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offset = 0
+            while offset + _BLOCK.size <= size:
+                magic, rows, length, crc = _BLOCK.unpack_from(mm, offset)
+                start = offset + _BLOCK.size
+                end = start + length
+                #a torn tail from a crash or a writer mid-append ends the segment
+                if magic != _MAGIC or end > size:
+                    logger.warning(f"Stopping at incomplete history block in {path.name} at byte {offset}")
+                    return
+                body = mm[start:end]
+                if zlib.crc32(body) != crc:
+                    logger.warning(f"Stopping at corrupt history block in {path.name} at byte {offset}")
+                    return
+                yield rows, _split_parts(body)
+                offset = end
+
+
+class HistoryTable:
+    #column store for analytics; text columns are decoded on first use
+
+    def __init__(self):
+        self.size = 0
+        self._numeric = {name: array(kind) for name, kind in SCHEMA if kind not in ('dict', 'str')}
+        self._codes = {name: array('I') for name, kind in SCHEMA if kind == 'dict'}
+        self._dictionaries: Dict[str, List[str]] = {name: [] for name in self._codes}
+        self._dictionary_index: Dict[str, Dict[str, int]] = {name: {} for name in self._codes}
+        self._raw_text: Dict[str, List[bytes]] = {name: [] for name, kind in SCHEMA if kind == 'str'}
+        self._text: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def read(cls, paths: Sequence[Path]) -> 'HistoryTable':
+        table = cls()
+        for path in paths:
+            for rows, parts in read_blocks(path):
+                table._add_block(rows, parts)
+        return table
+
+    def _add_block(self, rows: int, parts: List[memoryview]):
+        parts = iter(parts)
+        for name, kind in SCHEMA:
+            if kind == 'dict':
+                entries = _split(next(parts))
+                codes = _read_array('I', next(parts))
+                index = self._dictionary_index[name]
+                dictionary = self._dictionaries[name]
+                remap = []
+                for entry in entries:
+                    code = index.get(entry)
+                    if code is None:
+                        code = index[entry] = len(dictionary)
+                        dictionary.append(entry)
+                    remap.append(code)
+                if remap != list(range(len(remap))):
+                    codes = array('I', map(remap.__getitem__, codes))
+                self._codes[name].extend(codes)
+            elif kind == 'str':
+                self._raw_text[name].append(bytes(next(parts)))
+            else:
+                self._numeric[name].extend(_read_array(kind, next(parts)))
+        self.size += rows
+
+    def column(self, name: str):
+        kind = _KINDS[name]
+        if kind == 'dict':
+            dictionary = self._dictionaries[name]
+            return [dictionary[code] for code in self._codes[name]]
+        if kind == 'str':
+            return self._text_column(name)
+        return self._numeric[name]
+
+    def _text_column(self, name: str) -> List[str]:
+        with self._lock:
+            if name not in self._text:
+                values = []
+                for raw in self._raw_text[name]:
+                    values.extend(raw.decode('utf-8').split(_SEP))
+                self._text[name] = values
+                self._raw_text[name] = []
+            return self._text[name]
+
+    def value(self, name: str, row: int):
+        kind = _KINDS[name]
+        if kind == 'dict':
+            return self._dictionaries[name][self._codes[name][row]]
+        if kind == 'str':
+            return self._text_column(name)[row]
+        return self._numeric[name][row]
+
+    def record(self, row: int) -> dict:
+        return {name: self.value(name, row) for name, _ in SCHEMA}
+
+    def latest_index(self) -> Dict[str, int]:
+        #later rows win, so this is the last result per email
+        uids = self._text_column('uid')
+        return dict(zip(uids, range(len(uids))))
+
+    def select(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               **equals: str) -> List[int]:
+        #row numbers recorded in [since, until) whose dictionary columns match
+        rows = range(self.size)
+        recorded_at = self._numeric['recorded_at']
+        if since is not None:
+            start = since.timestamp()
+            rows = [i for i in rows if recorded_at[i] >= start]
+        if until is not None:
+            end = until.timestamp()
+            rows = [i for i in rows if recorded_at[i] < end]
+        for name, value in equals.items():
+            code = self._dictionary_index[name].get(value)
+            if code is None:
+                return []
+            codes = self._codes[name]
+            rows = [i for i in rows if codes[i] == code]
+        return list(rows)
+
+    def _key_codes(self, key: str, rows: Optional[Sequence[int]]):
+        codes = self._codes[key]
+        return codes if rows is None else [codes[i] for i in rows]
+
+    def count_by(self, key: str, rows: Optional[Sequence[int]] = None) -> Dict[str, int]:
+        dictionary = self._dictionaries[key]
+        counts = Counter(self._key_codes(key, rows))
+        return {dictionary[code]: count for code, count in counts.most_common()}
+
+    def mean_by(self, value: str, key: str, rows: Optional[Sequence[int]] = None) -> Dict[str, float]:
+        values = self._numeric[value]
+        rows = range(self.size) if rows is None else rows
+        codes = self._codes[key]
+        totals = defaultdict(float)
+        counts = Counter()
+        for i in rows:
+            v = values[i]
+            if not math.isnan(v):
+                totals[codes[i]] += v
+                counts[codes[i]] += 1
+        dictionary = self._dictionaries[key]
+        return {dictionary[code]: totals[code] / count for code, count in counts.most_common()}
+
+    def quantiles(self, value: str, qs: Sequence[float] = (0.5, 0.95, 0.99), key: Optional[str] = None,
+                  rows: Optional[Sequence[int]] = None) -> Dict[str, Dict[float, float]]:
+        values = self._numeric[value]
+        rows = range(self.size) if rows is None else rows
+        groups = defaultdict(list)
+        codes = self._codes[key] if key else None
+        for i in rows:
+            v = values[i]
+            if not math.isnan(v):
+                groups[codes[i] if codes else None].append(v)
+
+        result = {}
+        for code, samples in groups.items():
+            samples.sort()
+            label = self._dictionaries[key][code] if key else 'all'
+            result[label] = {q: samples[min(len(samples) - 1, int(len(samples) * q))] for q in qs}
+        return result
+
+    def daily_counts(self, rows: Optional[Sequence[int]] = None) -> Dict[str, int]:
+        recorded_at = self._numeric['recorded_at']
+        rows = range(self.size) if rows is None else rows
+        days = Counter(int(recorded_at[i] // 86400) for i in rows)
+        return {
+            datetime.fromtimestamp(day * 86400, tz=timezone.utc).strftime('%Y-%m-%d'): count
+            for day, count in sorted(days.items())
+        }
+
+
+class CategorizationHistory:
+    #append-only log of every categorization, reloaded at startup so known
+    #emails don't go back through the llm
+
+    def __init__(self, config: HistoryConfig):
+        self.config = config
+        self.directory = Path(config.directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._table: Optional[HistoryTable] = None
+        self._latest: Dict[str, int] = {}
+        self._recent: Dict[str, Tuple[tuple, dict]] = {}
+        self._segment: Optional[Path] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._table is not None
+
+    @property
+    def table(self) -> Optional[HistoryTable]:
+        #snapshot from the last load, rows recorded since then are not in it
+        return self._table
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob('history-*.akh'))
+
+    def load(self) -> HistoryTable:
+        table = HistoryTable.read(self.segments())
+        latest = table.latest_index()
+        #lookups need summaries, decode them now rather than on the first fetch
+        table.column('summary')
+        with self._lock:
+            self._table = table
+            self._latest = latest
+        return table
+
+    def _segment_for(self, size: int) -> Path:
+        if self._segment is None:
+            segments = self.segments()
+            self._segment = segments[-1] if segments else self.directory / "history-00001.akh"
+        if self._segment.exists() and self._segment.stat().st_size + size > self.config.segment_bytes:
+            number = int(self._segment.stem.split('-')[1]) + 1
+            self._segment = self.directory / f"history-{number:05d}.akh"
+        return self._segment
+
+    def _append(self, block: bytes):
+        with self._lock:
+            path = self._segment_for(len(block))
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                view = memoryview(block)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+
+    def record(self, results: Sequence[CategorizedEmail], latencies: Optional[Dict[str, float]] = None,
+               source: str = 'fetch'):
+        if not self.config.enabled or not results:
+            return
+        latencies = latencies or {}
+        now = time.time()
+        rows = [
+            (
+                now,
+                r.email.date.timestamp(),
+                r.confidence,
+                latencies.get(r.email.uid, math.nan),
+                r.bucket_id,
+                r.bucket_title,
+                r.model or '',
+                r.model_tier,
+                source,
+                r.email.sender,
+                r.email.uid,
+                r.email.subject,
+                r.summary or ''
+            )
+            for r in results
+        ]
+
+        try:
+            self._append(encode_block(rows))
+        except Exception as e:
+            logger.error(f"Failed to write categorization history: {str(e)}")
+            return
+
+        with self._lock:
+            for r in results:
+                self._recent[r.email.uid] = (_identity(r.email.sender, r.email.subject, r.email.date.timestamp()), {
+                    'bucket_id': r.bucket_id,
+                    'bucket_title': r.bucket_title,
+                    'summary': r.summary,
+                    'confidence': r.confidence,
+                    'model_tier': r.model_tier,
+                    'model': r.model
+                })
+
+    def lookup(self, email: EmailMessage) -> Optional[dict]:
+        #the categorization fields of the last result for this email; imap
+        #uids are reused across mailboxes and uidvalidity changes, so the
+        #recorded sender, subject and date have to match as well
+        expected = _identity(email.sender, email.subject, email.date.timestamp())
+        with self._lock:
+            if email.uid in self._recent:
+                identity, fields = self._recent[email.uid]
+                return dict(fields) if identity == expected else None
+            table = self._table
+            row = self._latest.get(email.uid)
+        if row is None:
+            return None
+
+        identity = _identity(table.value('sender', row), table.value('subject', row),
+                             table.value('email_date', row))
+        if identity != expected:
+            return None
+
+        return {
+            'bucket_id': table.value('bucket_id', row),
+            'bucket_title': table.value('bucket_title', row),
+            'summary': table.value('summary', row) or None,
+            #stored as float32
+            'confidence': round(table.value('confidence', row), 4),
+            'model_tier': table.value('model_tier', row),
+            'model': table.value('model', row) or None
+        }
+
+
+def _identity(sender: str, subject: str, date_ts: float) -> tuple:
+    #str columns drop the separator on write, so compare the stored form
+    return (sender.replace(_SEP, ''), subject.replace(_SEP, ''), round(date_ts))
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import load_history_config
+
+    parser = argparse.ArgumentParser(description="Summarize the categorization history")
+    parser.add_argument('--days', type=int, default=None, help="only the last N days")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    history = CategorizationHistory(load_history_config())
+    table = history.load()
+    print(f"{len(table)} results in {len(history.segments())} segment(s), "
+          f"loaded in {time.perf_counter() - started:.2f}s")
+
+    rows = None
+    if args.days:
+        rows = table.select(since=datetime.fromtimestamp(time.time() - args.days * 86400))
+
+    confidence = table.mean_by('confidence', 'bucket_title', rows)
+    print("\nBuckets")
+    for title, count in table.count_by('bucket_title', rows).items():
+        print(f"  {title:<30}{count:>10}   mean confidence {confidence.get(title, 0):.2f}")
+
+    print("\nLatency by model (s)")
+    for model, q in table.quantiles('latency', key='model', rows=rows).items():
+        print(f"  {model or '-':<30}" + "".join(f"  p{int(k * 100)} {v:.2f}" for k, v in q.items()))
+
+    print("\nPer day")
+    for day, count in table.daily_counts(rows).items():
+        print(f"  {day}{count:>10}")
@@ -1,10 +1,23 @@
-from dataclasses import dataclass
+import base64
+import gzip
+import json
+import sys
+from array import array
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
+from typing import List, Optional
 
 
 class BucketCategory(str, Enum):
     UNCATEGORIZED = "uncategorized"
+    PENDING = "pending"
+
+
+class BucketChange(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
     
 
 @dataclass
@@ -29,6 +42,17 @@ class EmailMessage:
             'body': self.body,
             'snippet': self.snippet
         }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'EmailMessage':
+        return cls(
+            uid=data['uid'],
+            subject=data['subject'],
+            sender=data['sender'],
+            date=datetime.fromisoformat(data['date']),
+            body=data['body'],
+            snippet=data['snippet']
+        )
 
 
 @dataclass
@@ -63,6 +87,8 @@ class CategorizedEmail:
     bucket_title: str
     summary: str
     confidence: float 
+    model_tier: str = "primary"
+    model: Optional[str] = None
     
     def to_dict(self) -> dict:
         return {
@@ -70,5 +96,105 @@ class CategorizedEmail:
             'bucket_id': self.bucket_id,
             'bucket_title': self.bucket_title,
             'summary': self.summary,
-            'confidence': self.confidence
-        }
\ No newline at end of file
+            'confidence': self.confidence,
+            'model_tier': self.model_tier,
+            'model': self.model
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CategorizedEmail':
+        return cls(
+            email=EmailMessage.from_dict(data['email']),
+            bucket_id=data['bucket_id'],
+            bucket_title=data['bucket_title'],
+            summary=data['summary'],
+            confidence=data['confidence'],
+            model_tier=data.get('model_tier', 'primary'),
+            model=data.get('model')
+        )
+
+
+@dataclass
+class EmailSearchResult:
+    categorized: CategorizedEmail
+    distance: float
+
+
+BUNDLE_FORMAT = "autokite-buckets"
+BUNDLE_VERSION = 1
+
+
+def _pack_embedding(embedding: List[float]) -> str:
+    #little-endian float32, a quarter of the size of the json floats
+    values = array('f', embedding)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode('ascii')
+
+
+def _unpack_embedding(packed: str) -> List[float]:
+    values = array('f')
+    values.frombytes(base64.b64decode(packed))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tolist()
+
+
+@dataclass
+class BucketBundle:
+    #portable bucket set, embeddings are only reusable under the same model
+    embedding_model: str
+    dimension: int
+    buckets: List[Bucket]
+    embeddings: List[Optional[List[float]]] = field(default_factory=list)
+    exported_at: datetime = field(default_factory=datetime.now)
+    
+    @property
+    def has_embeddings(self) -> bool:
+        return len(self.embeddings) == len(self.buckets) and all(
+            embedding is not None and len(embedding) == self.dimension for embedding in self.embeddings
+        )
+    
+    def to_dict(self) -> dict:
+        embeddings = self.embeddings or [None] * len(self.buckets)
+        return {
+            'format': BUNDLE_FORMAT,
+            'version': BUNDLE_VERSION,
+            'embedding_model': self.embedding_model,
+            'dimension': self.dimension,
+            'count': len(self.buckets),
+            'exported_at': self.exported_at.isoformat(),
+            'buckets': [
+                dict(bucket.to_dict(), embedding=_pack_embedding(embedding) if embedding is not None else None)
+                for bucket, embedding in zip(self.buckets, embeddings)
+            ]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BucketBundle':
+        if data.get('format') != BUNDLE_FORMAT:
+            raise ValueError("Not a bucket bundle")
+        if data.get('version', 0) > BUNDLE_VERSION:
+            raise ValueError(f"Unsupported bucket bundle version {data['version']}")
+        
+        entries = data['buckets']
+        return cls(
+            embedding_model=data.get('embedding_model', ''),
+            dimension=data.get('dimension', 0),
+            buckets=[Bucket.from_dict(entry) for entry in entries],
+            embeddings=[
+                _unpack_embedding(entry['embedding']) if entry.get('embedding') else None
+                for entry in entries
+            ],
+            exported_at=datetime.fromisoformat(data['exported_at']) if data.get('exported_at') else datetime.now()
+        )
+    
+    def to_bytes(self) -> bytes:
+        return gzip.compress(json.dumps(self.to_dict()).encode('utf-8'), compresslevel=6)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'BucketBundle':
+        #plain json is accepted too, so bundles can be written by hand
+        if data[:2] == b'\x1f\x8b':
+            data = gzip.decompress(data)
+        return cls.from_dict(json.loads(data.decode('utf-8')))
@@ -0,0 +1,455 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class NoHealthyHostError(RuntimeError):
+    pass
+
+
+class CircuitOpenError(NoHealthyHostError):
+    pass
+
+
+class DeadlineExceededError(NoHealthyHostError):
+    pass
+
+
+def _default_client(host: str, timeout: Optional[float] = None) -> Any:
+    import ollama
+    return ollama.Client(host=host, timeout=timeout)
+
+
+class Deadline:
+    #one time budget shared by every call made for a fetch
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class CircuitBreaker:
+    #opens after `threshold` failed attempts in a row, then lets a single
+    #trial call through once `cooldown` has passed
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.last_error: Optional[str] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def admit(self) -> Optional[bool]:
+        #None when the call is refused, otherwise whether it is the half-open trial
+        with self._lock:
+            if self.threshold <= 0 or self.state == CIRCUIT_CLOSED:
+                return False
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = CIRCUIT_HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CIRCUIT_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return None
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def cancel_trial(self):
+        #the trial never reached a host, let the next call try instead
+        with self._lock:
+            if self.state == CIRCUIT_HALF_OPEN:
+                self._trial_in_flight = False
+
+    def record(self, error: Optional[Exception], trial: bool = False):
+        with self._lock:
+            if error is None:
+                #calls admitted before the circuit opened don't close it,
+                #only the half-open trial does
+                if trial and self.state == CIRCUIT_HALF_OPEN:
+                    logger.info("Ollama circuit closed, calls recovered")
+                    self.state = CIRCUIT_CLOSED
+                    self._trial_in_flight = False
+                if self.state == CIRCUIT_CLOSED:
+                    self.consecutive_failures = 0
+                return
+
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            if self.threshold <= 0 or self.state == CIRCUIT_OPEN:
+                return
+            if self.state == CIRCUIT_HALF_OPEN and not trial:
+                return
+            if self.state == CIRCUIT_HALF_OPEN or self.consecutive_failures >= self.threshold:
+                logger.warning(f"Ollama circuit open for {self.cooldown:.0f}s after "
+                               f"{self.consecutive_failures} failures: {str(error)}")
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'last_error': self.last_error
+            }
+
+
+@dataclass
+class HostStats:
+    host: str
+    healthy: bool = True
+    in_flight: int = 0
+    #calls we stopped waiting for that are still holding a worker thread
+    abandoned: int = 0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    total_latency: float = 0.0
+    last_error: Optional[str] = None
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def avg_latency(self) -> float:
+        return self.total_latency / self.requests if self.requests else 0.0
+
+    @property
+    def throughput(self) -> float:
+        #completed requests per second since the host was added
+        elapsed = time.monotonic() - self.started_at
+        return self.requests / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'host': self.host,
+            'healthy': self.healthy,
+            'in_flight': self.in_flight,
+            'abandoned': self.abandoned,
+            'requests': self.requests,
+            'failures': self.failures,
+            'avg_latency': self.avg_latency,
+            'throughput': self.throughput,
+            'last_error': self.last_error
+        }
+
+
+class _PooledHost:
+
+    def __init__(self, host: str, client: Any):
+        self.host = host
+        self.client = client
+        self.stats = HostStats(host=host)
+
+
+class _Attempt:
+    #one call on one host; once the caller stops waiting it is abandoned and
+    #its outcome no longer counts towards host stats, latencies or the breaker
+
+    def __init__(self, pooled: _PooledHost, trial: bool):
+        self.pooled = pooled
+        self.trial = trial
+        self.started_at: Optional[float] = None
+        self.finished = False
+        self.abandoned = False
+
+
+class OllamaHostPool:
+
+    def __init__(self, hosts: List[str], health_check_interval: float = 15.0,
+                 max_failures: int = 3, max_retries: int = 2,
+                 client_factory: Optional[Callable[[str], Any]] = None,
+                 request_timeout: float = 60.0, retry_backoff: float = 0.25,
+                 retry_backoff_max: float = 2.0, hedge_quantile: float = 0.95,
+                 hedge_min_samples: int = 20, breaker_threshold: int = 5,
+                 breaker_cooldown: float = 30.0, max_abandoned: int = 4):
+        if not hosts:
+            raise ValueError("At least one Ollama host is required")
+
+        #the client timeout only frees threads of calls we already gave up on
+        client_factory = client_factory or partial(_default_client, timeout=request_timeout)
+        self._hosts = [_PooledHost(host, client_factory(host)) for host in hosts]
+        self._lock = threading.Lock()
+        self.health_check_interval = health_check_interval
+        self.max_failures = max_failures
+        self.max_retries = max_retries
+        self.request_timeout = request_timeout
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.max_abandoned = max_abandoned
+
+        #attempts run here so the caller can stop waiting on a stalled one;
+        #abandoned calls keep their thread until the client timeout, so they
+        #get their own bounded share and a stalled host can't fill the queue
+        self._executor = ThreadPoolExecutor(max_workers=max(8, 8 * len(hosts)) + max_abandoned * len(hosts),
+                                            thread_name_prefix="ollama-call")
+        self._latencies: Dict[str, deque] = {}
+        self.call_stats = {'hedged': 0, 'hedge_wins': 0, 'timeouts': 0, 'short_circuited': 0}
+
+        self._stop_event = threading.Event()
+        self._health_thread = None
+        if health_check_interval > 0:
+            self.start_health_checks()
+
+    @property
+    def hosts(self) -> List[str]:
+        return [h.host for h in self._hosts]
+
+    def start_health_checks(self):
+        if self._health_thread and self._health_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._health_thread = threading.Thread(
+            target=self._health_loop,
+            name="ollama-health-check",
+            daemon=True
+        )
+        self._health_thread.start()
+
+    def close(self):
+        self._stop_event.set()
+        if self._health_thread:
+            self._health_thread.join(timeout=1.0)
+        self._executor.shutdown(wait=False)
+
+    def _health_loop(self):
+        while not self._stop_event.wait(self.health_check_interval):
+            self.check_health()
+
+    def check_health(self):
+        for pooled in self._hosts:
+            try:
+                pooled.client.list()
+                with self._lock:
+                    if not pooled.stats.healthy:
+                        logger.info(f"Re-admitting Ollama host {pooled.host}")
+                    pooled.stats.healthy = True
+                    pooled.stats.consecutive_failures = 0
+            except Exception as e:
+                with self._lock:
+                    pooled.stats.last_error = str(e)
+                    if pooled.stats.healthy:
+                        logger.warning(f"Ejecting Ollama host {pooled.host}: {str(e)}")
+                    pooled.stats.healthy = False
+
+    def _acquire(self, exclude: set, healthy_only: bool = False) -> Optional[_PooledHost]:
+        with self._lock:
+            candidates = [h for h in self._hosts if h.host not in exclude and
+                          (self.max_abandoned <= 0 or h.stats.abandoned < self.max_abandoned)]
+            healthy = [h for h in candidates if h.stats.healthy]
+            #if everything is ejected, still try rather than fail outright
+            pool = healthy if healthy_only else healthy or candidates
+            if not pool:
+                return None
+
+            pooled = min(pool, key=lambda h: h.stats.in_flight)
+            pooled.stats.in_flight += 1
+            return pooled
+
+    def _mark_failed(self, pooled: _PooledHost, error: Exception):
+        stats = pooled.stats
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        stats.last_error = str(error)
+        if stats.healthy and stats.consecutive_failures >= self.max_failures:
+            logger.warning(f"Ejecting Ollama host {pooled.host} after "
+                           f"{stats.consecutive_failures} failures")
+            stats.healthy = False
+
+    def _finish(self, attempt: _Attempt, method: str, latency: float, error: Optional[Exception]):
+        with self._lock:
+            stats = attempt.pooled.stats
+            stats.in_flight -= 1
+            attempt.finished = True
+            if attempt.abandoned:
+                stats.abandoned -= 1
+                return
+
+            if error is None:
+                stats.requests += 1
+                stats.total_latency += latency
+                stats.consecutive_failures = 0
+                self._latencies.setdefault(method, deque(maxlen=200)).append(latency)
+            else:
+                self._mark_failed(attempt.pooled, error)
+        self.breaker.record(error, attempt.trial)
+
+    def _abandon(self, attempt: _Attempt, timeout: Optional[float] = None):
+        #timeout is None for a hedge that lost the race, which isn't a failure
+        with self._lock:
+            if attempt.finished or attempt.abandoned:
+                return
+            attempt.abandoned = True
+            #still queued behind other calls, the host never saw it
+            started = attempt.started_at is not None
+            if started:
+                attempt.pooled.stats.abandoned += 1
+            if timeout is None:
+                return
+            self.call_stats['timeouts'] += 1
+            charged = started
+            if charged:
+                error = TimeoutError(f"no response within {timeout:.1f}s")
+                self._mark_failed(attempt.pooled, error)
+
+        if charged:
+            self.breaker.record(error, attempt.trial)
+        elif attempt.trial:
+            self.breaker.cancel_trial()
+
+    def _invoke(self, attempt: _Attempt, method: str, kwargs: dict) -> Any:
+        with self._lock:
+            if attempt.abandoned:
+                attempt.pooled.stats.in_flight -= 1
+                attempt.finished = True
+                return None
+            attempt.started_at = time.monotonic()
+
+        try:
+            result = getattr(attempt.pooled.client, method)(**kwargs)
+        except Exception as e:
+            self._finish(attempt, method, time.monotonic() - attempt.started_at, e)
+            raise
+
+        self._finish(attempt, method, time.monotonic() - attempt.started_at, None)
+        return result
+
+    def _hedge_delay(self, method: str) -> Optional[float]:
+        #send a backup request once a call is slower than the recent p95
+        if self.hedge_quantile <= 0 or len(self._hosts) < 2:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get(method, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_quantile))]
+
+    def _attempt(self, method: str, kwargs: dict, tried: set, timeout: float, trial: bool) -> Any:
+        #fresh hosts first, then any host again after a backoff
+        pooled = self._acquire(tried) or self._acquire(set())
+        if pooled is None:
+            if trial:
+                self.breaker.cancel_trial()
+            raise NoHealthyHostError("every Ollama host is tied up with stalled calls")
+        tried.add(pooled.host)
+        started = time.monotonic()
+        primary = _Attempt(pooled, trial)
+        futures = {self._executor.submit(self._invoke, primary, method, kwargs): primary}
+
+        hedge = None
+        #the half-open trial stays a single call
+        hedge_after = None if trial else self._hedge_delay(method)
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                hedged = self._acquire(tried, healthy_only=True)
+                if hedged is not None:
+                    tried.add(hedged.host)
+                    with self._lock:
+                        self.call_stats['hedged'] += 1
+                    hedge = _Attempt(hedged, trial)
+                    futures[self._executor.submit(self._invoke, hedge, method, kwargs)] = hedge
+
+        error = None
+        while futures:
+            remaining = timeout - (time.monotonic() - started)
+            done, _ = wait(futures, timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+            if not done:
+                for running in futures.values():
+                    self._abandon(running, timeout)
+                raise TimeoutError(f"no response within {timeout:.1f}s")
+
+            for future in done:
+                attempt = futures.pop(future)
+                if future.exception() is None:
+                    if attempt is hedge:
+                        with self._lock:
+                            self.call_stats['hedge_wins'] += 1
+                    for running in futures.values():
+                        self._abandon(running)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _backoff(self, attempt: int, deadline: Optional[Deadline]):
+        #full jitter so retries from many workers don't line up
+        delay = random.uniform(0, min(self.retry_backoff_max, self.retry_backoff * 2 ** attempt))
+        if deadline is not None:
+            delay = min(delay, deadline.remaining())
+        time.sleep(delay)
+
+    def _call(self, method: str, deadline: Optional[Deadline] = None, **kwargs) -> Any:
+        tried = set()
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._backoff(attempt - 1, deadline)
+
+            timeout = self.request_timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline.remaining())
+                if timeout <= 0:
+                    raise DeadlineExceededError(
+                        f"Ollama {method} deadline exceeded after {attempt} attempt(s): {str(last_error)}"
+                    )
+
+            trial = self.breaker.admit()
+            if trial is None:
+                with self._lock:
+                    self.call_stats['short_circuited'] += 1
+                raise CircuitOpenError(
+                    f"Ollama circuit open, failing fast: {self.breaker.last_error or last_error}"
+                )
+
+            try:
+                return self._attempt(method, kwargs, tried, timeout, trial)
+            except Exception as e:
+                last_error = e
+                logger.warning(f"Ollama {method} failed (attempt {attempt + 1}): {str(e)}")
+
+        raise NoHealthyHostError(
+            f"Ollama {method} failed on {len(tried)} host(s): {str(last_error)}"
+        )
+
+    def chat(self, deadline: Optional[Deadline] = None, **kwargs) -> Any:
+        return self._call('chat', deadline=deadline, **kwargs)
+
+    def list(self) -> Any:
+        return self._call('list')
+
+    def get_stats(self) -> List[Dict]:
+        with self._lock:
+            return [h.stats.to_dict() for h in self._hosts]
+
+    def get_call_stats(self) -> Dict:
+        hedge_after = self._hedge_delay('chat')
+        with self._lock:
+            stats = dict(self.call_stats)
+        stats['hedge_after'] = hedge_after
+        stats['circuit'] = self.breaker.to_dict()
+        return stats
@@ -0,0 +1,269 @@
+import cProfile
+import io
+import linecache
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from config import ProfilingConfig
+
+logger = logging.getLogger(__name__)
+
+#modules whose allocations get their own section in the report
+FOCUS_FILES = ('email_client.py', 'categorizer.py', 'summarizer.py')
+
+#a thread parked in one of these is idle, and their frames sit under every
+#worker, so they are left out of the sampled hot list
+_IDLE_FILES = ('threading.py', 'selectors.py', 'queue.py', 'socketserver.py')
+_PLUMBING_FILES = ('threading.py', os.path.join('concurrent', 'futures', 'thread.py'))
+
+#tracemalloc and the sampler are process-wide, so one run at a time; runs
+#that start meanwhile go unprofiled and are listed in the active run's report
+_active_lock = threading.Lock()
+_active_run: Optional['ProfileRun'] = None
+
+
+class _StackSampler(threading.Thread):
+    #cProfile only sees the thread it runs in, categorization happens on
+    #worker threads, so sample every thread's stack as well
+
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.samples = 0
+        self.busy = 0
+        self.threads = set()
+        self.own = Counter()
+        self.cumulative = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                self.samples += 1
+                self.threads.add(thread_id)
+                if frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                self.busy += 1
+                self.own[_frame_key(frame)] += 1
+                seen = set()
+                while frame is not None:
+                    key = _frame_key(frame)
+                    if key not in seen and not frame.f_code.co_filename.endswith(_PLUMBING_FILES):
+                        seen.add(key)
+                        self.cumulative[key] += 1
+                    frame = frame.f_back
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=1.0)
+
+
+def _frame_key(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _short_path(filename: str) -> str:
+    #trim the sys.path entry so library frames read like bs4/element.py
+    for root in sorted(filter(None, sys.path), key=len, reverse=True):
+        root = os.path.abspath(root)
+        if filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return filename
+
+
+class ProfileRun:
+
+    def __init__(self, name: str, config: ProfilingConfig):
+        self.name = name
+        self.config = config
+        self.directory: Optional[Path] = None
+        self._profiler = cProfile.Profile()
+        self._sampler = _StackSampler(config.sample_interval)
+        self._owns_tracemalloc = False
+        self._started = 0.0
+        self._wall = 0.0
+        self._thread_id = None
+        self._profiling = False
+        self.skipped = []
+
+    def start(self):
+        if self.config.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.config.traceback_frames)
+            self._owns_tracemalloc = True
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._sampler.start()
+        self._started = time.perf_counter()
+        self._thread_id = threading.get_ident()
+        self._profiler.enable()
+        self._profiling = True
+
+    def detach(self):
+        #cProfile only follows the thread that started the run; call this there
+        #before handing the run to another thread, the sampler keeps going
+        if self._profiling and threading.get_ident() == self._thread_id:
+            self._profiler.disable()
+            self._profiling = False
+
+    def stop(self):
+        self.detach()
+        self._wall = time.perf_counter() - self._started
+        self._sampler.stop()
+        snapshot = None
+        peak = 0
+        if tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+
+        try:
+            self.directory = self._write(snapshot, peak)
+            logger.info(f"Profile for '{self.name}' written to {self.directory}")
+        except Exception as e:
+            logger.error(f"Failed to write profile for '{self.name}': {str(e)}")
+
+    def _write(self, snapshot: Optional[tracemalloc.Snapshot], peak: int) -> Path:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        directory = Path(self.config.output_dir) / f"{stamp}-{self.name}"
+        directory.mkdir(parents=True, exist_ok=True)
+
+        self._profiler.dump_stats(str(directory / 'profile.prof'))
+        (directory / 'report.txt').write_text(self._report(snapshot, peak), encoding='utf-8')
+        return directory
+
+    def _report(self, snapshot: Optional[tracemalloc.Snapshot], peak: int) -> str:
+        top_n = self.config.top_n
+        sampler = self._sampler
+        lines = [
+            f"Profile: {self.name}",
+            f"Wall time: {self._wall:.3f} s",
+            f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB" if snapshot else "Memory tracing off",
+            f"Samples: {sampler.busy} busy of {sampler.samples} across {len(sampler.threads)} "
+            f"thread(s), every {self.config.sample_interval * 1000:.0f} ms",
+            ""
+        ]
+        if self.skipped:
+            lines.append(f"Not profiled, started during this run: {', '.join(self.skipped)}; "
+                         f"their threads still show up in the sampled hot lists")
+            lines.append("")
+        if snapshot is not None:
+            lines.append("Memory tracing inflates timings of allocation-heavy code, "
+                         "set AUTOKITE_PROFILE_MEMORY=0 for CPU-only timings")
+            lines.append("")
+
+        lines.append("Hot functions, busy samples from all threads")
+        lines.append(f"{'cum %':>7}{'own %':>7}  function")
+        total = max(sampler.busy, 1)
+        for key, count in sampler.cumulative.most_common(top_n):
+            lines.append(f"{count / total:>7.1%}{sampler.own[key] / total:>7.1%}  {key}")
+        lines.append("")
+
+        lines.append("Hottest leaf functions, busy samples from all threads")
+        lines.append(f"{'own %':>7}  function")
+        for key, count in sampler.own.most_common(top_n):
+            lines.append(f"{count / total:>7.1%}  {key}")
+        lines.append("")
+
+        lines.append("Hot functions, calling thread (cProfile, by cumulative time)")
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+        lines.append(stream.getvalue().strip())
+        lines.append("")
+
+        if snapshot is None:
+            return "\n".join(lines) + "\n"
+
+        lines.append("Largest allocation sites (live at the end of the run)")
+        lines.extend(_format_sites(snapshot.statistics('lineno')[:top_n]))
+        lines.append("")
+
+        lines.append(f"Allocations attributed to {', '.join(FOCUS_FILES)}")
+        lines.extend(_format_focus(snapshot, top_n))
+        return "\n".join(lines) + "\n"
+
+
+def _format_sites(statistics) -> list:
+    lines = [f"{'KiB':>10}{'blocks':>9}  site"]
+    for stat in statistics:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:>10.1f}{stat.count:>9}  "
+                     f"{_short_path(frame.filename)}:{frame.lineno}")
+    return lines
+
+
+def _format_focus(snapshot: tracemalloc.Snapshot, top_n: int) -> list:
+    #charge each allocation to the innermost frame in one of our modules, so
+    #e.g. BeautifulSoup's allocations show up under _clean_html
+    sizes = Counter()
+    counts = Counter()
+    for stat in snapshot.statistics('traceback'):
+        for frame in reversed(stat.traceback):
+            if frame.filename.endswith(FOCUS_FILES):
+                key = (frame.filename, frame.lineno)
+                sizes[key] += stat.size
+                counts[key] += stat.count
+                break
+
+    lines = [f"{'KiB':>10}{'blocks':>9}  site"]
+    for (filename, lineno), size in sizes.most_common(top_n):
+        source = _source_line(filename, lineno)
+        lines.append(f"{size / 1024:>10.1f}{counts[(filename, lineno)]:>9}  "
+                     f"{_short_path(filename)}:{lineno}  {source}")
+    return lines
+
+
+def _source_line(filename: str, lineno: int) -> str:
+    return linecache.getline(filename, lineno).strip()
+
+
+def begin_run(name: str, config: Optional[ProfilingConfig]) -> Optional[ProfileRun]:
+    #None unless profiling is switched on, or while another run is profiled
+    global _active_run
+    if config is None or not config.enabled:
+        return None
+
+    with _active_lock:
+        if _active_run is not None:
+            _active_run.skipped.append(name)
+            logger.warning(f"Not profiling '{name}', '{_active_run.name}' is being profiled")
+            return None
+        run = _active_run = ProfileRun(name, config)
+    run.start()
+    return run
+
+
+def end_run(run: Optional[ProfileRun]):
+    #may be called from another thread once the run was detached there
+    global _active_run
+    if run is None:
+        return
+    try:
+        run.stop()
+    finally:
+        with _active_lock:
+            _active_run = None
+
+
+@contextmanager
+def profile_run(name: str, config: Optional[ProfilingConfig]):
+    run = begin_run(name, config)
+    try:
+        yield run
+    finally:
+        end_run(run)
@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+
+from models import BucketChange, CategorizedEmail
+from bucket_manager import BucketManager
+from categorizer import EmailCategorizer, DEFERRED_TIER, deferred_result
+from categorization_service import CategorizationClient
+from config import ProfilingConfig
+from profiling import profile_run
+from history import CategorizationHistory
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RecategorizationReport:
+    change: BucketChange
+    bucket_id: str
+    total: int = 0
+    selected: int = 0
+    rechecked: int = 0
+    changed: int = 0
+    done: bool = False
+    error: Optional[str] = None
+    updated: Dict[str, CategorizedEmail] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            'change': self.change.value,
+            'bucket_id': self.bucket_id,
+            'total': self.total,
+            'selected': self.selected,
+            'rechecked': self.rechecked,
+            'changed': self.changed,
+            'done': self.done,
+            'error': self.error
+        }
+
+
+class RecategorizationJob:
+
+    def __init__(self, bucket_manager: BucketManager, categorizer: Union[EmailCategorizer, CategorizationClient],
+                 change: BucketChange, bucket_id: str, shortlist_size: int = 8,
+                 batch_size: int = 20, profiling: Optional[ProfilingConfig] = None,
+                 history: Optional[CategorizationHistory] = None):
+        self.bucket_manager = bucket_manager
+        self.categorizer = categorizer
+        self.shortlist_size = shortlist_size
+        self.batch_size = batch_size
+        self.profiling = profiling
+        self.history = history
+        self.report = RecategorizationReport(change=change, bucket_id=bucket_id)
+        self._thread = None
+
+    def start(self) -> 'RecategorizationJob':
+        self._thread = threading.Thread(
+            target=self._run_profiled,
+            name=f"recategorize-{self.report.bucket_id[:8]}",
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run_profiled(self):
+        with profile_run(f"recategorize-{self.report.bucket_id[:8]}", self.profiling):
+            self._run()
+
+    def _run(self):
+        report = self.report
+        try:
+            report.total = self.bucket_manager.get_indexed_email_count()
+            affected = self.bucket_manager.find_affected_emails(report.bucket_id, report.change)
+            report.selected = len(affected)
+            logger.info(f"Re-categorizing {len(affected)}/{report.total} emails after bucket "
+                        f"{report.bucket_id} was {report.change.value}")
+
+            buckets = self.bucket_manager.get_all_buckets()
+            pending: List[CategorizedEmail] = []
+            latencies: Dict[str, float] = {}
+
+            for previous in affected:
+                started = time.monotonic()
+                candidates = self.bucket_manager.shortlist_buckets(
+                    previous.email, buckets, self.shortlist_size
+                )
+                result = self.categorizer.categorize_email(previous.email, candidates)
+                latencies[result.email.uid] = time.monotonic() - started
+                report.rechecked += 1
+
+                #a failed llm call should not overwrite the previous decision,
+                #unless that decision points at the bucket that was just deleted
+                if result.model_tier == DEFERRED_TIER:
+                    if report.change != BucketChange.DELETED or previous.bucket_id != report.bucket_id:
+                        continue
+                    result = deferred_result(previous.email)
+                    result.summary = previous.summary
+
+                if result.bucket_id != previous.bucket_id:
+                    report.changed += 1
+                    report.updated[result.email.uid] = result
+                    pending.append(result)
+
+                if len(pending) >= self.batch_size:
+                    self._save(pending, latencies)
+                    pending = []
+
+            self._save(pending, latencies)
+            logger.info(f"Re-categorization done: {report.rechecked}/{report.total} re-checked, "
+                        f"{report.changed} changed")
+
+        except Exception as e:
+            report.error = str(e)
+            logger.error(f"Re-categorization failed for bucket {report.bucket_id}: {str(e)}")
+        finally:
+            report.done = True
+
+    def _save(self, results: List[CategorizedEmail], latencies: Dict[str, float]):
+        self.bucket_manager.index_emails(results)
+        if self.history:
+            self.history.record(results, latencies, source='recategorize')
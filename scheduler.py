@@ -0,0 +1,312 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+from models import EmailMessage, Bucket, CategorizedEmail, BucketCategory
+from bucket_manager import BucketManager
+from categorizer import EmailCategorizer, DEFERRED_TIER, deferred_result
+from ollama_pool import Deadline
+from history import CategorizationHistory
+from categorization_service import CategorizationClient
+from profiling import ProfileRun, end_run
+
+logger = logging.getLogger(__name__)
+
+#lower runs first
+PRIORITY_OPENED = 0
+PRIORITY_VISIBLE = 1
+PRIORITY_BACKGROUND = 2
+
+
+def pending_placeholder(email: EmailMessage) -> CategorizedEmail:
+    return CategorizedEmail(
+        email=email,
+        bucket_id=BucketCategory.PENDING.value,
+        bucket_title="Pending",
+        summary=None,
+        confidence=0.0
+    )
+
+
+class CategorizationScheduler:
+
+    def __init__(self, categorizer: Union[EmailCategorizer, CategorizationClient], bucket_manager: BucketManager,
+                 shortlist_size: int = 8, workers: int = 2, deadline: float = 0.0,
+                 retry_delay: float = 30.0, max_deferrals: int = 3,
+                 history: Optional[CategorizationHistory] = None):
+        self.categorizer = categorizer
+        self.bucket_manager = bucket_manager
+        self.shortlist_size = shortlist_size
+        #seconds a whole batch may take, 0 for no limit
+        self.deadline = deadline
+        self.retry_delay = retry_delay
+        self.max_deferrals = max_deferrals
+        self.history = history
+
+        self._cond = threading.Condition()
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._emails: Dict[str, EmailMessage] = {}
+        self._results: Dict[str, CategorizedEmail] = {}
+        self._in_progress: set = set()
+        self._buckets: List[Bucket] = []
+        self._generation = 0
+        self._batch_deadline: Optional[Deadline] = None
+        self._deferrals: Dict[str, int] = {}
+        self._retry_ready: set = set()
+        self._batch_indexed = False
+        self._latencies: Dict[str, float] = {}
+        self._reused: set = set()
+        #best priority each queued uid has, so repeated promotes push nothing new
+        self._priority: Dict[str, int] = {}
+        #profiles the current batch until its last result is in
+        self._profile_run: Optional[ProfileRun] = None
+        self._closed = False
+
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"categorize-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, emails: List[EmailMessage], buckets: List[Bucket],
+               visible_uids: Iterable[str] = (), profile_run: Optional[ProfileRun] = None):
+        #a new batch replaces whatever is still queued from the last one;
+        #profile_run is ended here once the batch settles
+        visible = {uid: rank for rank, uid in enumerate(visible_uids)}
+        newest_first = sorted(emails, key=lambda e: e.date, reverse=True)
+        reused = self._from_history(emails, buckets)
+
+        with self._cond:
+            unsaved = self._take_unsaved()
+            replaced_run = self._profile_run
+            self._profile_run = profile_run
+            self._generation += 1
+            self._queue = []
+            self._emails = {email.uid: email for email in emails}
+            self._results = dict(reused)
+            self._reused = set(reused)
+            self._latencies = {}
+            self._buckets = buckets
+            self._batch_deadline = Deadline(self.deadline) if self.deadline > 0 else None
+            self._deferrals = {}
+            self._retry_ready = set()
+            self._batch_indexed = False
+            self._priority = {}
+
+            for rank, email in enumerate(newest_first):
+                if email.uid in reused:
+                    continue
+                if email.uid in visible:
+                    key = (PRIORITY_VISIBLE, visible[email.uid])
+                else:
+                    key = (PRIORITY_BACKGROUND, rank)
+                self._priority[email.uid] = key[0]
+                heapq.heappush(self._queue, (key, next(self._seq), email.uid))
+
+            #everything came from history, nothing left to profile
+            settled_run = None if self._queue else self._take_profile_run()
+            self._cond.notify_all()
+        self._save(*unsaved)
+        end_run(replaced_run)
+        end_run(settled_run)
+
+        logger.info(f"Scheduled {len(emails)} emails ({len(reused)} from history, "
+                    f"{len(visible)} visible first)")
+
+    def _from_history(self, emails: List[EmailMessage], buckets: List[Bucket]) -> Dict[str, CategorizedEmail]:
+        #past results still pointing at a live bucket don't need the llm again;
+        #uncategorized ones (including parse failures) get another try, since
+        #a bucket added since then may fit
+        if self.history is None or not self.history.config.reuse_results:
+            return {}
+
+        titles = {bucket.id: bucket.title for bucket in buckets}
+        reused = {}
+        for email in emails:
+            known = self.history.lookup(email)
+            if known is None or known['bucket_id'] not in titles or known['model_tier'] == DEFERRED_TIER:
+                continue
+            known['bucket_title'] = titles[known['bucket_id']]
+            reused[email.uid] = CategorizedEmail(email=email, **known)
+        return reused
+
+    def promote(self, uids: Iterable[str], priority: int = PRIORITY_OPENED):
+        with self._cond:
+            promoted = False
+            for rank, uid in enumerate(uids):
+                if uid in self._emails and uid not in self._results and \
+                        (self._generation, uid) not in self._in_progress and \
+                        priority < self._priority.get(uid, PRIORITY_BACKGROUND + 1):
+                    #the stale heap entry is skipped once this one is done
+                    self._priority[uid] = priority
+                    heapq.heappush(self._queue, ((priority, rank), next(self._seq), uid))
+                    promoted = True
+            if promoted:
+                self._cond.notify_all()
+
+    def cancel(self):
+        #whatever already finished is still indexed and recorded
+        with self._cond:
+            unsaved = self._take_unsaved()
+            self._generation += 1
+            self._queue = []
+            self._emails = {}
+            self._results = {}
+            self._deferrals = {}
+            self._retry_ready = set()
+            self._priority = {}
+            run = self._take_profile_run()
+        self._save(*unsaved)
+        end_run(run)
+
+    def _take_profile_run(self) -> Optional[ProfileRun]:
+        #call with _cond held
+        run, self._profile_run = self._profile_run, None
+        return run
+
+    def _take_unsaved(self) -> tuple:
+        #finished results of the current batch not yet indexed; call with _cond held
+        if self._batch_indexed:
+            return [], [], {}
+        self._batch_indexed = True
+        to_index = [r for r in self._results.values() if r.model_tier != DEFERRED_TIER]
+        return self._for_saving(to_index)
+
+    def _for_saving(self, to_index: List[CategorizedEmail]) -> tuple:
+        to_record = [r for r in to_index if r.email.uid not in self._reused]
+        latencies = {r.email.uid: self._latencies[r.email.uid] for r in to_record
+                     if r.email.uid in self._latencies}
+        return to_index, to_record, latencies
+
+    def _save(self, to_index: List[CategorizedEmail], to_record: List[CategorizedEmail],
+              latencies: Dict[str, float]):
+        if to_index:
+            #keep them searchable after the session ends
+            self.bucket_manager.index_emails(to_index)
+        if to_record and self.history:
+            self.history.record(to_record, latencies, source='fetch')
+
+    def close(self):
+        #drops queued work and lets the workers exit once their current email is done
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.cancel()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def result(self, uid: str) -> Optional[CategorizedEmail]:
+        with self._cond:
+            return self._results.get(uid)
+
+    def results(self) -> List[CategorizedEmail]:
+        #finished results, with placeholders for emails still queued
+        with self._cond:
+            return [
+                self._results.get(uid) or pending_placeholder(email)
+                for uid, email in self._emails.items()
+            ]
+
+    @property
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._emails) - len(self._results)
+
+    @property
+    def deferred_count(self) -> int:
+        #uncategorized for now, with a retry still to come
+        with self._cond:
+            return sum(1 for uid, r in self._results.items()
+                       if r.model_tier == DEFERRED_TIER and self._deferrals.get(uid, 0) <= self.max_deferrals)
+
+    def _retry(self, generation: int, uid: str):
+        with self._cond:
+            result = self._results.get(uid)
+            if self._closed or generation != self._generation or result is None or result.model_tier != DEFERRED_TIER:
+                return
+            self._retry_ready.add(uid)
+            heapq.heappush(self._queue, ((PRIORITY_BACKGROUND, 0), next(self._seq), uid))
+            self._cond.notify_all()
+
+    def wait_for(self, uids: Iterable[str], timeout: Optional[float] = None) -> bool:
+        uids = list(uids)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not all(uid in self._results or uid not in self._emails for uid in uids):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def _next_task(self) -> Optional[tuple]:
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                while self._queue:
+                    _, _, uid = heapq.heappop(self._queue)
+                    task = (self._generation, uid)
+                    waiting = uid not in self._results or uid in self._retry_ready
+                    if uid in self._emails and waiting and task not in self._in_progress:
+                        self._in_progress.add(task)
+                        #retries run outside the batch deadline, bounded per request
+                        deadline = None if uid in self._retry_ready else self._batch_deadline
+                        self._retry_ready.discard(uid)
+                        return self._generation, self._emails[uid], self._buckets, deadline
+                self._cond.wait()
+
+    def _worker(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            generation, email, buckets, deadline = task
+            started = time.monotonic()
+            try:
+                candidates = self.bucket_manager.shortlist_buckets(email, buckets, self.shortlist_size)
+                result = self.categorizer.categorize_email(email, candidates, deadline)
+            except Exception as e:
+                logger.error(f"Scheduled categorization failed for '{email.subject}': {str(e)}")
+                result = deferred_result(email)
+
+            retry = False
+            unsaved = ([], [], {})
+            run = None
+            with self._cond:
+                self._in_progress.discard((generation, email.uid))
+                if generation != self._generation:
+                    self._cond.notify_all()
+                    continue
+
+                self._results[email.uid] = result
+                self._latencies[email.uid] = time.monotonic() - started
+                if result.model_tier == DEFERRED_TIER:
+                    self._deferrals[email.uid] = self._deferrals.get(email.uid, 0) + 1
+                    retry = self._deferrals[email.uid] <= self.max_deferrals
+                elif self._batch_indexed:
+                    #a late retry that finally went through
+                    unsaved = self._for_saving([result])
+
+                if not self._batch_indexed and len(self._results) == len(self._emails):
+                    unsaved = self._take_unsaved()
+                    run = self._take_profile_run()
+                self._cond.notify_all()
+
+            if retry:
+                #spread retries out so they don't all hit the breaker's single trial call
+                delay = self.retry_delay * random.uniform(1.0, 1.5)
+                timer = threading.Timer(delay, self._retry, (generation, email.uid))
+                timer.daemon = True
+                timer.start()
+
+            self._save(*unsaved)
+            end_run(run)
@@ -0,0 +1,165 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from models import EmailMessage
+from config import OllamaConfig
+from ollama_pool import OllamaHostPool
+
+logger = logging.getLogger(__name__)
+
+#rough token estimate, good enough for budgeting prompts
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_chunks(text: str, max_tokens: int) -> List[str]:
+    #pack paragraphs, then sentences, then raw slices into token-budgeted chunks
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            pieces.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class LongEmailSummarizer:
+    #map-reduce summaries over the full body, for emails the snippet can't cover
+
+    def __init__(self, pool: OllamaHostPool, config: OllamaConfig):
+        self.pool = pool
+        self.config = config
+        self._executor = ThreadPoolExecutor(max_workers=config.summary_workers, thread_name_prefix="summary")
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def content_key(self, email: EmailMessage) -> str:
+        material = f"{self.config.model}\n{email.subject}\n{email.sender}\n{email.body}"
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _chat(self, prompt: str) -> str:
+        response = self.pool.chat(
+            model=self.config.model,
+            messages=[{'role': 'user', 'content': prompt}],
+            options={'temperature': self.config.temperature}
+        )
+        return response['message']['content'].strip()
+
+    def _summarize_chunk(self, email: EmailMessage, chunk: str, index: int, total: int) -> str:
+        prompt = f"""You are summarizing part {index + 1} of {total} of a long email.
+
+Subject: {email.subject}
+From: {email.sender}
+
+PART {index + 1}:
+{chunk}
+
+Summarize this part in 2-3 sentences. Keep names, dates, amounts, deadlines and requested actions.
+
+Summary:"""
+        return self._chat(prompt)
+
+    def _merge(self, email: EmailMessage, partials: List[str]) -> str:
+        numbered = "\n".join(f"{i + 1}. {p}" for i, p in enumerate(partials))
+        prompt = f"""You are summarizing a long email from partial summaries of its sections, in order.
+
+Subject: {email.subject}
+From: {email.sender}
+
+PARTIAL SUMMARIES:
+{numbered}
+
+Combine them into one summary of 3-5 sentences. Keep names, dates, amounts, deadlines and requested actions.
+
+Summary:"""
+        return self._chat(prompt)
+
+    def _group(self, partials: List[str]) -> List[List[str]]:
+        #pack whole partials into budgeted groups; partials may contain blank
+        #lines themselves, so they are never re-split
+        max_chars = self.config.summary_chunk_tokens * CHARS_PER_TOKEN
+        groups = []
+        current = []
+        size = 0
+        for partial in partials:
+            if current and size + len(partial) + 2 > max_chars:
+                groups.append(current)
+                current = []
+                size = 0
+            current.append(partial)
+            size += len(partial) + 2
+        if current:
+            groups.append(current)
+        return groups
+
+    def _truncate(self, partials: List[str]) -> List[str]:
+        #an equal share of the budget for each partial
+        share = max(1, self.config.summary_chunk_tokens * CHARS_PER_TOKEN // len(partials) - 2)
+        return [partial[:share] for partial in partials]
+
+    def _reduce(self, email: EmailMessage, partials: List[str]) -> str:
+        #merge in groups that fit the budget until one summary is left
+        while len(partials) > 1:
+            groups = self._group(partials)
+            if len(groups) == 1:
+                return self._merge(email, partials)
+            if len(groups) >= len(partials):
+                #every partial fills half the budget or more, so another round
+                #wouldn't shrink anything; merge once over truncated partials
+                logger.warning(f"Summaries of '{email.subject}' aren't shrinking, "
+                               f"merging {len(partials)} truncated partials")
+                return self._merge(email, self._truncate(partials))
+            partials = list(self._executor.map(lambda group: self._merge(email, group), groups))
+        return partials[0]
+
+    def summarize(self, email: EmailMessage) -> str:
+        key = self.content_key(email)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        chunks = split_chunks(email.body or email.snippet, self.config.summary_chunk_tokens)
+        if not chunks:
+            return ""
+
+        partials = list(self._executor.map(
+            lambda item: self._summarize_chunk(email, item[1], item[0], len(chunks)),
+            enumerate(chunks)
+        ))
+        summary = self._reduce(email, partials)
+        logger.info(f"Summarized '{email.subject}' from {len(chunks)} chunk(s)")
+
+        with self._lock:
+            self._cache[key] = summary
+            while len(self._cache) > self.config.summary_cache_size:
+                self._cache.popitem(last=False)
+        return summary